@@ -0,0 +1,173 @@
+import numpy as np
+from physics import DIMENSION, GRAV_CONSTANT
+from vector_physics import VectorPhysics
+
+# Nodes are not split further than this, so that bodies at the same position cannot cause endless recursion.
+MAX_DEPTH = 64
+
+class Octree:
+    """
+    Octree over a set of bodies, used by BarnesHutPhysics. Each cell is split into 2**DIMENSION children until it holds
+    at most leaf_size bodies. The bodies of every node form a contiguous range in self.order, so node masses and
+    centres of mass are computed from prefix sums.
+    """
+
+    def __init__(self, positions, masses, size=None, leaf_size=8):
+        """
+        positions: (N, 3) array of body positions
+        masses: (N,) array of body masses
+        size: (min, max) coordinates of the cube that the root cell covers, e.g. SolarSystem.get_size(). The cube is
+              grown if a body lies outside it.
+        leaf_size: maximum number of bodies in a leaf
+        """
+        self.positions = positions
+        self.masses = masses
+        self.leaf_size = leaf_size
+
+        # Node data, indexed by node number
+        self.start = []
+        self.end = []
+        self.half_width = []
+        self.children = []
+
+        # Determine the root cell
+        if len(positions) > 0:
+            low, high = positions.min(axis=0), positions.max(axis=0)
+        else:
+            low, high = np.zeros(DIMENSION), np.zeros(DIMENSION)
+        if size is not None:
+            low, high = np.minimum(low, size[0]), np.maximum(high, size[1])
+        centre = (low + high)/2
+        half_width = max((high - low).max()/2, 1.0)*(1 + 1e-9)
+
+        self.order = np.empty(len(positions), dtype=np.intp)
+        self.filled = 0
+        self.build(np.arange(len(positions)), centre, half_width, 0)
+        self.start, self.end = np.array(self.start, dtype=np.intp), np.array(self.end, dtype=np.intp)
+        self.half_width = np.array(self.half_width)
+
+        # Rank of each body in self.order, used to find out whether a body belongs to a node
+        self.rank = np.empty(len(positions), dtype=np.intp)
+        self.rank[self.order] = np.arange(len(positions))
+
+        # Node masses and centres of mass from prefix sums over the ordered bodies
+        ordered_m = masses[self.order]
+        cum_m = np.concatenate(([0.0], np.cumsum(ordered_m)))
+        cum_mx = np.vstack((np.zeros(DIMENSION), np.cumsum(ordered_m[:, np.newaxis]*positions[self.order], axis=0)))
+        self.mass = cum_m[self.end] - cum_m[self.start]
+        safe_mass = np.where(self.mass > 0, self.mass, 1.0)
+        self.centre_of_mass = (cum_mx[self.end] - cum_mx[self.start])/safe_mass[:, np.newaxis]
+
+    def build(self, indices, centre, half_width, depth):
+        """Recursively creates the node for the bodies in indices. Returns the node number."""
+        node = len(self.start)
+        self.start.append(self.filled)
+        self.half_width.append(half_width)
+        self.children.append([])
+        self.end.append(0)
+
+        if len(indices) <= self.leaf_size or depth >= MAX_DEPTH:
+            self.order[self.filled:self.filled + len(indices)] = indices
+            self.filled += len(indices)
+        else:
+            # Octant of each body as a bit code, one bit per dimension
+            above = self.positions[indices] >= centre
+            codes = (above*(1 << np.arange(DIMENSION))).sum(axis=1)
+            sort = np.argsort(codes, kind='stable')
+            indices, codes = indices[sort], codes[sort]
+            bounds = np.searchsorted(codes, np.arange(2**DIMENSION + 1))
+            for code in range(2**DIMENSION):
+                if bounds[code] < bounds[code + 1]:
+                    offset = np.array([half_width/2 if code & (1 << i) else -half_width/2 for i in range(DIMENSION)])
+                    child = self.build(indices[bounds[code]:bounds[code + 1]], centre + offset, half_width/2, depth + 1)
+                    self.children[node].append(child)
+
+        self.end[node] = self.filled
+        return node
+
+    def is_leaf(self, node):
+        return len(self.children[node]) == 0
+
+class BarnesHutPhysics(VectorPhysics):
+    """
+    Physics engine that approximates the gravity of distant groups of bodies by their centre of mass (Barnes-Hut).
+    A cell of width s at distance d is used as a whole if s/d < theta, so theta = 0 gives the exact sum and larger
+    values trade accuracy for speed. Evaluating all accelerations takes O(N log N) instead of O(N^2) time.
+    """
+
+    def __init__(self, theta=0.5, size=None, leaf_size=8):
+        """
+        theta: opening angle
+        size: (min, max) coordinates of the system, e.g. SolarSystem.get_size()
+        leaf_size: maximum number of bodies in an octree leaf
+        """
+        super().__init__()
+        self.theta = theta
+        self.size = size
+        self.leaf_size = leaf_size
+
+    def set_theta(self, theta):
+        self.theta = theta
+
+    def set_size(self, size):
+        self.size = size
+
+    def accelerations(self, targets, sources, masses, exclude_self=False):
+        """
+        Calculates the approximate gravitational acceleration at each of the target positions caused by all source bodies.
+        Takes the same arguments as VectorPhysics.accelerations.
+        """
+        self.evaluations += len(targets)
+        acc = np.zeros((len(targets), DIMENSION))
+        if len(targets) == 0 or len(sources) == 0:
+            return acc
+
+        tree = Octree(sources, masses, self.size, self.leaf_size)
+
+        # Walk the tree with groups of targets: each node is visited once with all targets that still need it opened.
+        stack = [(0, np.arange(len(targets)))]
+        while stack:
+            node, idx = stack.pop()
+            r = tree.centre_of_mass[node] - targets[idx]
+            r_squared = np.einsum('ij,ij->i', r, r)
+            accepted = (2*tree.half_width[node])**2 < self.theta**2*r_squared
+
+            if accepted.any():
+                self.interactions += int(accepted.sum())
+                node_mass = np.full(accepted.sum(), tree.mass[node])
+                node_r = r[accepted]
+                if exclude_self:
+                    # Remove the target's own mass from the cell it belongs to.
+                    own = idx[accepted]
+                    rank = tree.rank[own]
+                    inside = (tree.start[node] <= rank) & (rank < tree.end[node])
+                    if inside.any():
+                        own = own[inside]
+                        remaining = tree.mass[node] - masses[own]
+                        safe = np.where(remaining > 0, remaining, 1.0)[:, np.newaxis]
+                        com = (tree.mass[node]*tree.centre_of_mass[node] - masses[own][:, np.newaxis]*sources[own])/safe
+                        node_r[inside] = com - targets[own]
+                        node_mass[inside] = remaining
+                node_r_squared = np.einsum('ij,ij->i', node_r, node_r)
+                contributing = node_mass > 0
+                factor = np.zeros(len(node_mass))
+                factor[contributing] = GRAV_CONSTANT*node_mass[contributing]/(node_r_squared[contributing]*np.sqrt(node_r_squared[contributing]))
+                acc[idx[accepted]] += factor[:, np.newaxis]*node_r
+
+            idx = idx[~accepted]
+            if len(idx) == 0:
+                continue
+            if tree.is_leaf(node):
+                # Direct summation over the bodies in the leaf
+                members = tree.order[tree.start[node]:tree.end[node]]
+                self.interactions += len(idx)*len(members)
+                r = sources[members][np.newaxis, :, :] - targets[idx][:, np.newaxis, :]
+                r_squared = np.einsum('ijk,ijk->ij', r, r)
+                if exclude_self:
+                    r_squared[idx[:, np.newaxis] == members[np.newaxis, :]] = np.inf
+                factor = GRAV_CONSTANT*masses[members]/(r_squared*np.sqrt(r_squared))
+                acc[idx] += np.einsum('ij,ijk->ik', factor, r)
+            else:
+                for child in tree.children[node]:
+                    stack.append((child, idx))
+        return acc
@@ -0,0 +1,271 @@
+"""
+Benchmarks for the step loop, the settings file reader and the renderer on generated systems of different sizes.
+The results are written as JSON, so that runs of different versions can be compared, e.g. in CI.
+
+Usage: python -m benchmark [--sizes N [N ...]] [--engines NAME [NAME ...]] [--integrator NAME] [--duration SECONDS]
+                           [--seed SEED] [--no-render] [--output FILE] [--baseline FILE] [--tolerance FRACTION]
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+from io import StringIO
+import numpy as np
+from solar_system_file import SolarSystemFile
+from physics import Physics, GRAV_CONSTANT
+from vector_physics import VectorPhysics
+from barnes_hut import BarnesHutPhysics
+import numba_physics
+from integrators import INTEGRATORS
+
+# Version of the format of the results file
+VERSION = 1
+
+# Physics engines that can be benchmarked
+ENGINES = {
+    'physics': Physics,
+    'vector': VectorPhysics,
+    'barnes_hut': BarnesHutPhysics,
+}
+if numba_physics.AVAILABLE:
+    ENGINES['numba'] = numba_physics.NumbaPhysics
+
+# The plain Physics engine takes O(N^2) Python operations per step, so it is only run on systems smaller than this.
+PURE_LIMIT = 1000
+
+# Load times shorter than this many seconds are too noisy to be compared against a baseline.
+NOISE_FLOOR = 0.01
+
+# Metrics compared against a baseline: True if a larger value is better.
+METRICS = {
+    'steps_per_second': True,
+    'evaluations_per_second': True,
+    'check_impact_per_second': True,
+    'updates_per_second': True,
+    'frames_per_second': True,
+    'load_time': False,
+    'peak_memory': False,
+}
+
+def generate(n, seed=0):
+    """
+    Returns the text of a settings file with a sun and n - 1 bodies on roughly circular orbits between 0.3 and 30 AU.
+    The same n and seed always give the same system.
+    """
+    rng = np.random.default_rng(seed)
+    sun_mass = 1.989E30
+    lines = ["Sun,{!r},{!r},0:0:0,0:0:0,255:255:0".format(sun_mass, 696E6)]
+    count = n - 1
+    distances = 149597870700*rng.uniform(0.3, 30, count)
+    angles = rng.uniform(0, 2*np.pi, count)
+    heights = rng.normal(0, 0.01, count)*distances
+    speeds = np.sqrt(GRAV_CONSTANT*sun_mass/distances)
+    masses = 10**rng.uniform(20, 26, count)
+    radii = rng.uniform(1E5, 1E7, count)
+    colours = rng.integers(0, 256, (count, 3))
+    for i in range(count):
+        position = [distances[i]*np.cos(angles[i]), distances[i]*np.sin(angles[i]), heights[i]]
+        velocity = [-speeds[i]*np.sin(angles[i]), speeds[i]*np.cos(angles[i]), 0.0]
+        vectors = [':'.join(repr(float(c)) for c in vector) for vector in (position, velocity)]
+        colour = ':'.join(str(int(c)) for c in colours[i])
+        lines.append("Body{},{!r},{!r},{},{},{}".format(i, float(masses[i]), float(radii[i]), vectors[0], vectors[1], colour))
+    return '\n'.join(lines) + '\n'
+
+def load(text, engine):
+    """Reads a system from settings file text with the physics engine named engine. Returns the system and the load time."""
+    physics = ENGINES[engine]()
+    start = time.perf_counter()
+    system = SolarSystemFile().read_settings_file(StringIO(text), physics if isinstance(physics, VectorPhysics) else None)
+    load_time = time.perf_counter() - start
+    system.set_physics(physics)
+    return system, load_time
+
+def prepare(system, engine, integrator):
+    """Sets the integrator and a time step of one day. The plain Physics engine can only run 'rk4'."""
+    system.set_integrator(integrator if engine != 'physics' else 'rk4')
+    system.set_time_step(24*60*60)
+    system.set_lifespan(float('inf'))
+
+def benchmark_steps(text, n, engine, integrator='rk4', duration=1.0):
+    """
+    Times the step loop of one system: steps and check_impact() calls are repeated for at least duration seconds.
+    The peak memory of loading the system and taking one step is measured in a separate run, so that tracing the
+    allocations does not slow down the timed run. Returns the results as a dict.
+    """
+    system, load_time = load(text, engine)
+    prepare(system, engine, integrator)
+    physics = system.get_physics()
+    evaluations = getattr(physics, 'evaluations', 0)
+
+    steps, step_time, impact_time = 0, 0.0, 0.0
+    while steps == 0 or step_time + impact_time < duration:
+        start = time.perf_counter()
+        system.next_time_step()
+        middle = time.perf_counter()
+        system.check_impact()
+        step_time += middle - start
+        impact_time += time.perf_counter() - middle
+        steps += 1
+
+    if hasattr(physics, 'evaluations'):
+        evaluations = physics.evaluations - evaluations
+    else:
+        # Physics.rk4 evaluates the net force on every body four times per step.
+        evaluations = 4*n*steps
+
+    tracemalloc.start()
+    system, unused = load(text, engine)
+    prepare(system, engine, integrator)
+    system.next_time_step()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'benchmark': 'step',
+        'bodies': n,
+        'engine': engine,
+        'integrator': system.get_integrator().__class__.__name__,
+        'load_time': load_time,
+        'steps': steps,
+        'steps_per_second': steps/step_time,
+        'evaluations_per_second': evaluations/step_time,
+        'check_impact_per_second': steps/impact_time,
+        'peak_memory': peak_memory,
+    }
+
+def benchmark_render(text, n, duration=1.0):
+    """
+    Times SolarSystemScene.update_planets() and the painting of the scene into an image with Qt's offscreen platform,
+    so no display is needed. The system is advanced with the leapfrog integrator between the frames, outside the timing.
+    Returns the results as a dict.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QImage, QPainter
+    from solar_system_scene import SolarSystemScene
+    application = QApplication.instance() or QApplication([])
+
+    system, unused = load(text, 'vector')
+    prepare(system, 'vector', 'leapfrog')
+    start = time.perf_counter()
+    scene = SolarSystemScene(system)
+    setup_time = time.perf_counter() - start
+
+    image = QImage(500, 500, QImage.Format_RGB32)
+    frames, update_time, paint_time = 0, 0.0, 0.0
+    while frames == 0 or update_time + paint_time < duration:
+        system.next_time_step()
+        start = time.perf_counter()
+        scene.update_planets()
+        middle = time.perf_counter()
+        painter = QPainter(image)
+        scene.render(painter)
+        painter.end()
+        update_time += middle - start
+        paint_time += time.perf_counter() - middle
+        frames += 1
+
+    return {
+        'benchmark': 'render',
+        'bodies': n,
+        'setup_time': setup_time,
+        'frames': frames,
+        'updates_per_second': frames/update_time,
+        'frames_per_second': frames/(update_time + paint_time),
+    }
+
+def run(sizes, engines, integrator='rk4', duration=1.0, seed=0, render=True, report=None):
+    """
+    Runs the benchmarks for every size and engine. Returns the results in the format of the JSON file.
+    report: function called with the result of each benchmark as soon as it is ready, e.g. to print it
+    """
+    results = []
+    for n in sizes:
+        text = generate(n, seed)
+        cases = [(benchmark_steps, (text, n, engine, integrator, duration)) for engine in engines if engine != 'physics' or n < PURE_LIMIT]
+        if render:
+            cases.append((benchmark_render, (text, n, duration)))
+        for function, arguments in cases:
+            result = function(*arguments)
+            results.append(result)
+            if report is not None:
+                report(result)
+    return {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': seed,
+        'duration': duration,
+        'results': results,
+    }
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compares results with the results of a baseline run. Returns a list of messages, one for each metric that is worse
+    than in the baseline by more than the fraction tolerance. Benchmarks missing from either run are ignored.
+    """
+    def key(result):
+        return (result['benchmark'], result['bodies'], result.get('engine'), result.get('integrator'))
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        for metric, larger_is_better in METRICS.items():
+            if metric not in result or metric not in old or old[metric] == 0:
+                continue
+            if metric == 'load_time' and max(result[metric], old[metric]) < NOISE_FLOOR:
+                continue
+            change = result[metric]/old[metric] - 1
+            if (larger_is_better and change < -tolerance) or (not larger_is_better and change > tolerance):
+                regressions.append("{} {} bodies {}: {} {:.4g} -> {:.4g} ({:+.0%})".format(result['benchmark'], result['bodies'],
+                                   result.get('engine', ''), metric, old[metric], result[metric], change))
+    return regressions
+
+def describe(result):
+    """Returns a one-line summary of the result of a benchmark."""
+    if result['benchmark'] == 'render':
+        return "render {:>6} bodies: setup {:.3f} s, {:.1f} updates/s, {:.1f} frames/s".format(
+            result['bodies'], result['setup_time'], result['updates_per_second'], result['frames_per_second'])
+    return "step   {:>6} bodies {:<10}: load {:.3f} s, {:.2f} steps/s, {:.3g} evaluations/s, {:.1f} check_impact/s, peak {:.1f} MB".format(
+        result['bodies'], result['engine'], result['load_time'], result['steps_per_second'], result['evaluations_per_second'],
+        result['check_impact_per_second'], result['peak_memory']/2**20)
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='Benchmarks the simulation on generated systems.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000], help='numbers of bodies (default: 10 100 1000 10000)')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES), help='physics engines (default: all)')
+    parser.add_argument('--integrator', choices=list(INTEGRATORS), default='rk4', help='integrator of the array engines (default: rk4)')
+    parser.add_argument('--duration', type=float, default=1.0, help='minimum time in seconds to run each benchmark (default: 1)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated systems (default: 0)')
+    parser.add_argument('--no-render', action='store_true', help='skip the render benchmark, which needs PyQt5')
+    parser.add_argument('--output', help='file to write the results to as JSON')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='fraction by which a metric may be worse than in the baseline (default: 0.2)')
+    return parser.parse_args(arguments)
+
+def main(arguments=None):
+    args = parse_arguments(arguments)
+    results = run(args.sizes, args.engines, args.integrator, args.duration, args.seed, not args.no_render, lambda result: print(describe(result)))
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import numpy as np
+from physics import DIMENSION
+
+# Number of rows the arrays of an empty store are allocated with. The capacity is doubled whenever it runs out.
+INITIAL_CAPACITY = 16
+
+class BodyStore:
+    """
+    Contiguous arrays holding the physical state of all bodies of a SolarSystem: one row per body in the arrays
+    mass, radius, pos, vel, acc, colour, test_particle and satellite. Row i belongs to bodies[i].
+
+    The bodies are CelestialBody objects attached to the store, which read and write their own row.
+    Engines can work on the arrays directly, without going through the bodies one at a time.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.bodies = []
+        self.n = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """Sets the number of rows allocated to capacity, keeping the rows in use."""
+        old = [getattr(self, name, None) for name in ('mass', 'radius', 'pos', 'vel', 'acc', 'colour', 'test_particle', 'satellite')]
+        self.mass = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        self.pos = np.zeros((capacity, DIMENSION))
+        self.vel = np.zeros((capacity, DIMENSION))
+        self.acc = np.zeros((capacity, DIMENSION))
+        self.colour = np.zeros((capacity, 3), dtype=np.int16)
+        self.test_particle = np.zeros(capacity, dtype=bool)
+        self.satellite = np.zeros(capacity, dtype=bool)
+        if old[0] is not None:
+            for array, previous in zip((self.mass, self.radius, self.pos, self.vel, self.acc, self.colour, self.test_particle, self.satellite), old):
+                array[:self.n] = previous[:self.n]
+
+    @staticmethod
+    def of(celestial_bodies):
+        """
+        Returns the store whose bodies list is celestial_bodies, or None if the list is not the list of a store.
+        Then the state arrays of the bodies are the first len(celestial_bodies) rows of the store's arrays.
+        """
+        if len(celestial_bodies) == 0:
+            return None
+        store = celestial_bodies[0].store
+        if store is not None and store.bodies is celestial_bodies:
+            return store
+        return None
+
+    def add(self, body):
+        """Appends body to the store and attaches it: its state is copied into a new row."""
+        if self.n == len(self.mass):
+            self.allocate(2*len(self.mass))
+        i = self.n
+        self.mass[i] = body.get_mass()
+        self.radius[i] = body.get_radius()
+        self.pos[i] = body.get_position()
+        self.vel[i] = body.get_velocity()
+        self.acc[i] = body.get_acceleration()
+        self.colour[i] = body.get_colour()
+        self.test_particle[i] = body.is_test_particle()
+        self.satellite[i] = body.is_satellite()
+        self.n += 1
+        self.bodies.append(body)
+        body.attach(self, i)
+
+    def remove(self, body):
+        """Removes body from the store and detaches it. The rows after it move up by one."""
+        i = body.index
+        if body.store is not self or i >= self.n or self.bodies[i] is not body:
+            raise ValueError("Body is not in the store")
+        self.keep(np.arange(self.n) != i)
+
+    def keep(self, mask):
+        """Keeps the bodies where the boolean (n,) array mask is True, in the same order. The others are detached."""
+        removed = [self.bodies[i] for i in np.nonzero(~mask)[0]]
+        for body in removed:
+            body.detach()
+        count = int(mask.sum())
+        for array in (self.mass, self.radius, self.pos, self.vel, self.acc, self.colour, self.test_particle, self.satellite):
+            array[:count] = array[:self.n][mask]
+        self.bodies[:] = [self.bodies[i] for i in np.nonzero(mask)[0]]
+        self.n = count
+        for i in range(count):
+            self.bodies[i].index = i
+
+    def clear(self):
+        """Detaches all bodies."""
+        self.keep(np.zeros(self.n, dtype=bool))
+
+    def get_arrays(self):
+        """Returns views of the positions, velocities and accelerations ((n, 3) arrays) and masses ((n,) array) in use."""
+        n = self.n
+        return self.pos[:n], self.vel[:n], self.acc[:n], self.mass[:n]
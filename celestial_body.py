@@ -3,47 +3,91 @@ import physics
 class CelestialBody:
     """
     Class to represent all celestial bodies in the solar system to be simulated.
+
+    Once added to a SolarSystem, a body is a view into a row of the system's BodyStore: the getters read the store's
+    arrays and the update methods write into them. A body that is not in a system keeps its state itself.
     """
 
+    __slots__ = ('name', 'store', 'index', 'm', 'r', 'x', 'v', 'a', 'colour', 'test_particle')
+
     def __init__(self, name, mass, radius, position, velocity, colour):
 
         self.name = name
+        self.store = None                                           # BodyStore the body is attached to, if any
+        self.index = None                                           # row of the body in the store
         self.m = mass
         self.r = radius
         self.x = position
         self.v = velocity
         self.a = [0 for i in range(physics.DIMENSION)]              # acceleration
         self.colour = colour
+        self.test_particle = False                                  # test particles feel gravity but do not cause it
+
+    def attach(self, store, index):
+        """Makes the body a view into row index of store. The state kept by the body itself is dropped."""
+        self.store, self.index = store, index
+        self.m = self.r = self.x = self.v = self.a = self.colour = None
+
+    def detach(self):
+        """Copies the state of the body out of its store, so that the body keeps it itself again."""
+        self.m, self.r = self.get_mass(), self.get_radius()
+        self.x, self.v, self.a = self.get_position(), self.get_velocity(), self.get_acceleration()
+        self.colour = self.get_colour()
+        self.store, self.index = None, None
 
     def get_name(self):
         return self.name
 
-    def get_position(self):
-        return self.x
-    
     def get_mass(self):
-        return self.m
+        if self.store is None:
+            return self.m
+        return float(self.store.mass[self.index])
     
     def get_radius(self):
-        return self.r
+        if self.store is None:
+            return self.r
+        return float(self.store.radius[self.index])
 
     def get_position(self):
-        return self.x
+        if self.store is None:
+            return self.x
+        return self.store.pos[self.index].tolist()
 
     def get_velocity(self):
-        return self.v
+        if self.store is None:
+            return self.v
+        return self.store.vel[self.index].tolist()
     
     def get_acceleration(self):
-        return self.a
+        if self.store is None:
+            return self.a
+        return self.store.acc[self.index].tolist()
     
     def get_colour(self):
-        return self.colour
+        if self.store is None:
+            return self.colour
+        return self.store.colour[self.index].tolist()
+
+    def is_test_particle(self):
+        return self.test_particle
+
+    def is_satellite(self):
+        return False
     
     def update_position(self, position):
-        self.x = position
+        if self.store is None:
+            self.x = position
+        else:
+            self.store.pos[self.index] = position
     
     def update_velocity(self, velocity):
-        self.v = velocity
+        if self.store is None:
+            self.v = velocity
+        else:
+            self.store.vel[self.index] = velocity
     
     def update_acceleration(self, acceleration):
-        self.a = acceleration
\ No newline at end of file
+        if self.store is None:
+            self.a = acceleration
+        else:
+            self.store.acc[self.index] = acceleration
@@ -0,0 +1,78 @@
+import io
+import numpy as np
+from celestial_body import CelestialBody
+from satellite import Satellite
+from integrators import INTEGRATORS
+from solar_system_error import SolarSystemError
+
+# Version of the checkpoint format
+VERSION = 1
+
+def serialize(system):
+    """
+    Serialises the full state of a SolarSystem (bodies, time, time step, lifespan, size, status flags and the name of
+    the integrator) into a compact binary blob (an uncompressed .npz archive of arrays). Returns the blob as bytes.
+    """
+    bodies = system.get_all_bodies()
+    store = system.store
+    n = store.n
+    integrator = [name for name in INTEGRATORS if type(system.get_integrator()) is INTEGRATORS[name]]
+
+    arrays = {
+        'version': np.array(VERSION),
+        'names': np.array([body.get_name() if body.get_name() is not None else '' for body in bodies], dtype=str),
+        'masses': store.mass[:n],
+        'radii': store.radius[:n],
+        'positions': store.pos[:n],
+        'velocities': store.vel[:n],
+        'accelerations': store.acc[:n],
+        'colours': store.colour[:n],
+        'satellites': store.satellite[:n],
+        'test_particles': store.test_particle[:n],
+        'times': np.array([system.get_time(), system.dt, system.get_lifespan()], dtype=float),
+        'size': np.array(system.get_size(), dtype=float),
+        'flags': np.array([system.impact_status(), system.satellites_status()], dtype=bool),
+        'integrator': np.array(integrator[0] if integrator else 'rk4'),
+    }
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+def restore(system, data):
+    """
+    Sets a SolarSystem to the state serialised in data (bytes from serialize()).
+    If the system has the same bodies as the checkpoint (same number and names), the states are copied into the
+    existing bodies, so that references to them, e.g. in the GUI, stay valid. Otherwise the bodies are replaced.
+    """
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        arrays = {key: archive[key] for key in archive.files}
+    if int(arrays['version']) != VERSION:
+        raise SolarSystemError("Unsupported checkpoint version: {}".format(int(arrays['version'])))
+
+    names = [str(name) if not satellite else None for name, satellite in zip(arrays['names'], arrays['satellites'])]
+
+    bodies = system.get_all_bodies()
+    if len(bodies) != len(names) or any(body.get_name() != name for body, name in zip(bodies, names)):
+        masses, radii, colours = arrays['masses'].tolist(), arrays['radii'].tolist(), arrays['colours'].tolist()
+        positions, velocities = arrays['positions'].tolist(), arrays['velocities'].tolist()
+        bodies = []
+        for i in range(len(names)):
+            if arrays['satellites'][i]:
+                body = Satellite(masses[i], positions[i], velocities[i], bool(arrays['test_particles'][i]))
+            else:
+                body = CelestialBody(names[i], masses[i], radii[i], positions[i], velocities[i], colours[i])
+            bodies.append(body)
+        system.set_bodies(bodies)
+
+    pos, vel, acc, masses = system.store.get_arrays()
+    pos[:], vel[:], acc[:] = arrays['positions'], arrays['velocities'], arrays['accelerations']
+
+    t, dt, lifespan = arrays['times'].tolist()
+    system.set_time(t)
+    system.set_time_step(dt)
+    system.set_lifespan(lifespan)
+    system.set_size(tuple(arrays['size'].tolist()))
+    system.impact, system.satellites_inside_system = (bool(flag) for flag in arrays['flags'])
+    system.impact_bodies, system.impact_time = None, None
+    system.previous_state = None
+    system.set_integrator(str(arrays['integrator']))
@@ -0,0 +1,162 @@
+import numpy as np
+
+# Upper limit for the number of candidate pairs tested at once.
+BLOCK_SIZE = 2**20
+
+# Number of points at which the paths of the bodies are sampled during a time step in the swept test.
+SAMPLES = 16
+
+# Number of bisection steps used to locate the time of impact.
+BISECTIONS = 40
+
+def overlapping_pairs(positions, radii):
+    """
+    Generator that finds the overlapping pairs of spheres, a block at a time. Yields two arrays i and j of sphere
+    indices such that sphere i[k] overlaps sphere j[k].
+
+    Broad phase: the spheres are sorted by the lower end of their extent along the x axis, and only pairs whose extents
+    overlap on that axis become candidates. Narrow phase: the candidates are tested with squared distances, a block
+    at a time. For bodies spread over space the number of candidates and the running time stay close to O(N log N).
+
+    positions: (N, 3) array of sphere centres
+    radii: (N,) array of sphere radii
+    """
+    n = len(positions)
+    if n < 2:
+        return
+
+    low, high = positions[:, 0] - radii, positions[:, 0] + radii
+    order = np.argsort(low, kind='stable')
+    low, high = low[order], high[order]
+
+    # The candidates of the sphere at sorted index k are the sorted indices k+1 ... end[k]-1.
+    end = np.searchsorted(low, high, side='right')
+    counts = np.maximum(end - np.arange(n) - 1, 0)
+    cumulative = np.cumsum(counts)
+
+    start = 0
+    while start < n:
+        done = cumulative[start - 1] if start > 0 else 0
+        stop = min(n, max(start + 1, int(np.searchsorted(cumulative, done + BLOCK_SIZE, side='right'))))
+        block_counts = counts[start:stop]
+        if block_counts.sum() > 0:
+            first = np.repeat(np.arange(start, stop), block_counts)
+            offsets = np.arange(len(first)) - np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+            i, j = order[first], order[first + 1 + offsets]
+            r = positions[i] - positions[j]
+            hits = np.einsum('ij,ij->i', r, r) <= (radii[i] + radii[j])**2
+            if hits.any():
+                yield i[hits], j[hits]
+        start = stop
+
+def sweep_and_prune(positions, radii):
+    """
+    Finds a pair of overlapping spheres. Returns the indices (i, j), i < j, of the first overlapping pair found, or None.
+    The search stops at the first block of candidates with a hit.
+    """
+    for i, j in overlapping_pairs(positions, radii):
+        return (int(min(i[0], j[0])), int(max(i[0], j[0])))
+    return None
+
+def hermite(pos_0, vel_0, pos_1, vel_1, h, s):
+    """
+    Interpolates positions within a time step with cubic Hermite polynomials, which match both the positions and the
+    velocities at the start and the end of the step.
+
+    pos_0, vel_0, pos_1, vel_1: (N, 3) arrays of the states at the start and at the end of the step
+    h: length of the step
+    s: fraction of the step, a number or an (N,) array
+    """
+    s = np.asarray(s, dtype=float)
+    if s.ndim > 0:
+        s = s[:, np.newaxis]
+    h00 = 2*s**3 - 3*s**2 + 1
+    h10 = s**3 - 2*s**2 + s
+    h01 = -2*s**3 + 3*s**2
+    h11 = s**3 - s**2
+    return h00*pos_0 + h10*h*vel_0 + h01*pos_1 + h11*h*vel_1
+
+def swept_impact(pos_0, vel_0, pos_1, vel_1, radii, h):
+    """
+    Finds the earliest collision during a time step, also between bodies that only overlap between its end points.
+    Returns (i, j, s) where i < j are the indices of the colliding bodies and s is the fraction of the step at which
+    they first touch, or None.
+
+    The paths are interpolated with hermite(). The broad phase runs sweep-and-prune on spheres that bound each body's
+    whole path during the step. The relative path of each candidate pair is sampled at SAMPLES points, the relative
+    motion between two samples is taken as linear and its closest approach is tested, so a fast body cannot pass
+    through another between the samples. The first contact is then located by bisection.
+    """
+    n = len(pos_0)
+    if n < 2:
+        return None
+
+    # Bounding box of each path, from the sampled points
+    low, high = np.minimum(pos_0, pos_1), np.maximum(pos_0, pos_1)
+    for s in np.linspace(0, 1, SAMPLES + 1)[1:-1]:
+        point = hermite(pos_0, vel_0, pos_1, vel_1, h, s)
+        low, high = np.minimum(low, point), np.maximum(high, point)
+    # The curve can bulge a little between the samples.
+    size = np.linalg.norm(high - low, axis=1)
+    centres = (low + high)/2
+    bounding_radii = radii + size/2 + size/SAMPLES
+
+    earliest = None
+    fractions = np.linspace(0, 1, SAMPLES + 1)
+    for i, j in overlapping_pairs(centres, bounding_radii):
+        reach = (radii[i] + radii[j])**2
+        found = np.full(len(i), np.nan)         # Fraction of the step at which each pair first touches
+        start = np.zeros(len(i))                # Last fraction at which each pair was apart
+        r_a = pos_0[i] - pos_0[j]
+        touching = np.einsum('ij,ij->i', r_a, r_a) <= reach
+        found[touching] = 0
+        for k in range(1, SAMPLES + 1):
+            open_pairs = np.isnan(found)
+            if not open_pairs.any():
+                break
+            r_b = hermite(pos_0[i], vel_0[i], pos_1[i], vel_1[i], h, fractions[k]) - hermite(pos_0[j], vel_0[j], pos_1[j], vel_1[j], h, fractions[k])
+            # First contact of the linear relative motion from r_a to r_b: smallest root u of |r_a + u*d|^2 = reach
+            d = r_b - r_a
+            a = np.einsum('ij,ij->i', d, d)
+            b = 2*np.einsum('ij,ij->i', r_a, d)
+            c = np.einsum('ij,ij->i', r_a, r_a) - reach
+            discriminant = b**2 - 4*a*c
+            with np.errstate(divide='ignore', invalid='ignore'):
+                u = np.where(a > 0, (-b - np.sqrt(np.maximum(discriminant, 0)))/(2*a), 0)
+            contact = open_pairs & ((c <= 0) | ((a > 0) & (discriminant >= 0) & (u >= 0) & (u <= 1)))
+            u = np.clip(u, 0, 1)
+            found[contact] = fractions[k - 1] + u[contact]*(fractions[k] - fractions[k - 1])
+            start[contact] = fractions[k - 1]
+            r_a = r_b
+
+        for k in np.nonzero(~np.isnan(found))[0]:
+            s = locate(pos_0, vel_0, pos_1, vel_1, h, i[k], j[k], reach[k], start[k], found[k])
+            if earliest is None or s < earliest[2]:
+                earliest = (int(min(i[k], j[k])), int(max(i[k], j[k])), s)
+    return earliest
+
+def locate(pos_0, vel_0, pos_1, vel_1, h, i, j, reach, low, estimate):
+    """
+    Event locator: refines the time at which bodies i and j first touch. low is a fraction of the step at which they are
+    apart and estimate the first contact of the linearised motion after it. If the interpolated paths touch at the
+    estimate, the first contact between low and estimate is found by bisection, otherwise the estimate is returned.
+    """
+    if estimate == 0:
+        return 0.0
+    states = [pos_0[[i, j]], vel_0[[i, j]], pos_1[[i, j]], vel_1[[i, j]]]
+
+    def touching(s):
+        points = hermite(*states, h, s)
+        r = points[0] - points[1]
+        return np.dot(r, r) <= reach
+
+    if not touching(estimate):
+        return float(estimate)
+    high = estimate
+    for k in range(BISECTIONS):
+        middle = (low + high)/2
+        if touching(middle):
+            high = middle
+        else:
+            low = middle
+    return float(high)
@@ -0,0 +1,8 @@
+from PyQt5.QtWidgets import QMessageBox
+
+class ErrorMessage(QMessageBox):
+    def __init__(self, message):
+        super().__init__()
+        self.setText(message)
+        self.setWindowTitle("Error")
+        self.exec()
\ No newline at end of file
@@ -1,10 +1,15 @@
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from solar_system_scene import *
-from solar_system_error import ErrorMessage
+from error_message import ErrorMessage
 import physics
 from satellite import Satellite
-from time import sleep
+from integrators import INTEGRATORS
+from simulation_worker import SimulationWorker
+import time
+
+# Rate at which the scene is redrawn while the simulation runs (frames per second)
+FRAME_RATE = 30
 
 class GUI(QtWidgets.QMainWindow):
 
@@ -16,6 +21,11 @@ class GUI(QtWidgets.QMainWindow):
 
         # Simulation is not currently running
         self.running = False
+        self.worker = None
+
+        # Timer that redraws the scene while the simulation runs in its own thread
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.animate_system)
 
     def init_ui(self):
 
@@ -37,7 +47,7 @@ class GUI(QtWidgets.QMainWindow):
 
         # Create the button to start, stop simulation
         self.run_button = QtWidgets.QPushButton()
-        grid.addWidget(self.run_button, 11, 0, 1, 3)
+        grid.addWidget(self.run_button, 12, 0, 1, 3)
 
         self.scene = SolarSystemScene(self.system)
         self.view = SolarSystemView(self.scene)
@@ -48,7 +58,7 @@ class GUI(QtWidgets.QMainWindow):
         self.status_bar = QtWidgets.QStatusBar(self)
         self.setStatusBar(self.status_bar)
 
-        grid.addWidget(self.view, 0, 4, 12, 1)
+        grid.addWidget(self.view, 0, 4, 13, 1)
 
         self.central_widget.setLayout(grid)
 
@@ -88,12 +98,17 @@ class GUI(QtWidgets.QMainWindow):
 
         self.add_satellite_button = QtWidgets.QPushButton('Add')
 
+        # Massless satellites only feel the gravity of the other bodies, which makes large numbers of them cheap to simulate
+        self.test_particle_box = QtWidgets.QCheckBox('Massless')
+        self.test_particle_box.setToolTip('Satellite is not a source of gravity')
+
         # Pressing enter in the last text fields acts like clicking the 'add' button
         self.posZ.returnPressed.connect(self.add_satellite)
 
         # Add text fields and titles to the layout
         grid.addWidget(self.satellite_title, 0, 0, 1, 3)
         grid.addWidget(self.mass_edit, 2, 0)
+        grid.addWidget(self.test_particle_box, 3, 0)
         grid.addWidget(self.speedX, 1, 1)
         grid.addWidget(self.speedY, 2, 1)
         grid.addWidget(self.speedZ, 3, 1)
@@ -132,6 +147,11 @@ class GUI(QtWidgets.QMainWindow):
         self.dt_label = QtWidgets.QLabel("{:5d} days".format(self.dt_slider.value()))
         self.dt_slider.valueChanged.connect(lambda: self.dt_label.setText("{:5d} days".format(self.dt_slider.value())))
 
+        # Integrator selection
+        self.integrator_title = QtWidgets.QLabel('Integrator')
+        self.integrator_box = QtWidgets.QComboBox(self)
+        self.integrator_box.addItems(list(INTEGRATORS))
+
         grid.addWidget(self.parameters_title, 6, 0, 1, 3)
 
         grid.addWidget(self.t_title, 7, 0, 1, 3)
@@ -141,6 +161,9 @@ class GUI(QtWidgets.QMainWindow):
         grid.addWidget(self.dt_title, 9, 0, 1, 3)
         grid.addWidget(self.dt_slider, 10, 0, 1, 2)
         grid.addWidget(self.dt_label, 10, 2)
+
+        grid.addWidget(self.integrator_title, 11, 0)
+        grid.addWidget(self.integrator_box, 11, 1, 1, 2)
     
     def add_satellite(self):
         """
@@ -159,7 +182,7 @@ class GUI(QtWidgets.QMainWindow):
                 msg = ErrorMessage("Mass must be positive.")
                 self.line_edits[0].clear()  # Clear mass text field
             else:
-                satellite = Satellite(mass, position, velocity)
+                satellite = Satellite(mass, position, velocity, self.test_particle_box.isChecked())
                 if physics.Physics().speed(satellite) >= physics.LIGHTSPEED:
                     msg = ErrorMessage("The speed of a satellite cannot be more than the speed of light.")
                     for i in range(1, 4):
@@ -191,8 +214,10 @@ class GUI(QtWidgets.QMainWindow):
             text_field.clear()
             text_field.setEnabled(False)
         self.add_satellite_button.setEnabled(False)
+        self.test_particle_box.setEnabled(False)
         self.t_slider.setEnabled(False)
         self.dt_slider.setEnabled(False)
+        self.integrator_box.setEnabled(False)
         self.view.setMouseTracking(False)
         self.view.setToolTip('')
 
@@ -204,23 +229,41 @@ class GUI(QtWidgets.QMainWindow):
         sim_time_step = self.dt_slider.value()*24*60*60     # seconds
         self.system.set_lifespan(sim_length)
         self.system.set_time_step(sim_time_step)
-
-        while self.running and self.system.get_time() < self.system.get_lifespan() and self.system.impact_status() == False and self.system.satellites_status() == True:
-            self.animate_system()
-            self.status_bar.showMessage('Time elapsed: {:3.2f} years'.format(self.system.get_time()/315.36e5))
-            QtWidgets.QApplication.processEvents()
-            sleep(0.01)
-        
-        self.simulation_over()
+        self.system.set_integrator(self.integrator_box.currentText())
+        # Collisions are searched along the whole time step, so that fast satellites cannot pass through planets even with long steps.
+        self.system.set_continuous_collisions(True)
+
+        # The physics runs in its own thread as fast as it can, while the timer redraws the newest state at a fixed rate.
+        self.worker = SimulationWorker(self.system)
+        self.worker.start()
+        self.timer.start(1000//FRAME_RATE)
     
     def animate_system(self):
-        # Call the next time step to be calculated
-        self.system.next_time_step()
-        # Check that objecst haven't collided and that satellites haven't flown away
-        self.system.check_impact()
-        self.system.check_satellites()
-        # Update the scene to match the current system
-        self.scene.update_planets()
+        """
+        Redraws the scene with the newest state of the simulation thread, skipping any states calculated in between.
+        """
+        if not self.running:
+            self.worker.stop()
+
+        if self.worker.finished:
+            # The thread has stopped, so the system can be read directly.
+            self.worker.join()
+            self.timer.stop()
+            self.scene.update_planets()
+            self.simulation_over()
+            return
+
+        snapshot = self.worker.take()
+        if snapshot is not None:
+            # Update the scene to match the snapshot of the system
+            stats = self.system.get_stats()
+            if stats is not None:
+                start = time.perf_counter()
+                self.scene.update_planets(snapshot)
+                stats.add('update_planets', time.perf_counter() - start)
+            else:
+                self.scene.update_planets(snapshot)
+            self.status_bar.showMessage('Time elapsed: {:3.2f} years'.format(snapshot.get_time()/315.36e5))
     
     def simulation_running_changed(self):
         """Changes the simulation running state from True -> False and False -> True."""
@@ -255,8 +298,10 @@ class GUI(QtWidgets.QMainWindow):
         for text_field in self.line_edits:
             text_field.setEnabled(True)
         self.add_satellite_button.setEnabled(True)
+        self.test_particle_box.setEnabled(True)
         self.t_slider.setEnabled(True)
         self.dt_slider.setEnabled(True)
+        self.integrator_box.setEnabled(True)
 
         # Sets the run button to run simulation again
         self.run_button.setText('Run simulation')
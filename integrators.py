@@ -0,0 +1,225 @@
+import numpy as np
+
+class Integrator:
+    """
+    Base class for the integrators that advance a SolarSystem by one time step.
+    Array integrators work on the (N, 3) state arrays of a VectorPhysics engine (or a subclass of it).
+    """
+
+    needs_arrays = True
+
+    def step(self, physics, celestial_bodies, h):
+        """
+        Advances all bodies in celestial_bodies by time h and updates their acceleration, velocity and position.
+        Returns the updated list.
+        """
+        pos, vel, acc, masses, n_massive, order = physics.get_state(celestial_bodies)
+        pos, vel, acc = self.advance(physics, pos, vel, acc, masses, n_massive, h)
+        physics.set_state(celestial_bodies, order, pos, vel, acc)
+        return celestial_bodies
+
+    def advance(self, physics, pos, vel, acc, masses, n_massive, h):
+        """Advances the state arrays by time h. Returns the new positions, velocities and accelerations."""
+        raise NotImplementedError
+
+    def reset(self):
+        """Forgets any information carried over from previous steps."""
+        pass
+
+class RungeKutta4(Integrator):
+    """The original scheme of Physics.rk4: RK4 stages for velocity, Euler's method for position."""
+
+    needs_arrays = False
+
+    def step(self, physics, celestial_bodies, h):
+        return physics.rk4(celestial_bodies, h)
+
+class Leapfrog(Integrator):
+    """
+    Kick-drift-kick leapfrog (velocity Verlet). Second order and symplectic, so the energy error stays bounded
+    instead of drifting. Needs one force evaluation per step.
+    """
+
+    def advance(self, physics, pos, vel, acc, masses, n_massive, h):
+        vel = vel + acc*(h/2)
+        pos = pos + vel*h
+        acc = physics.gravity(pos, pos, masses, n_massive)
+        vel = vel + acc*(h/2)
+        return pos, vel, acc
+
+class Yoshida4(Integrator):
+    """
+    Fourth order symplectic integrator of Yoshida (1990), made of three leapfrog steps of lengths w1*h, w0*h and w1*h.
+    Needs three force evaluations per step.
+    """
+
+    W1 = 1/(2 - 2**(1/3))
+    W0 = -2**(1/3)/(2 - 2**(1/3))
+
+    def advance(self, physics, pos, vel, acc, masses, n_massive, h):
+        for w in (self.W1, self.W0, self.W1):
+            vel = vel + acc*(w*h/2)
+            pos = pos + vel*(w*h)
+            acc = physics.gravity(pos, pos, masses, n_massive)
+            vel = vel + acc*(w*h/2)
+        return pos, vel, acc
+
+class DormandPrince(Integrator):
+    """
+    Adaptive Runge-Kutta 5(4) method of Dormand and Prince. The time step h is covered with as many sub-steps as the
+    error control needs: the estimated local error of each sub-step must stay below rtol times the largest position
+    (or velocity) in the system plus atol. The sub-step length is carried over to the next call.
+    """
+
+    C = [0, 1/5, 3/10, 4/5, 8/9, 1, 1]
+    A = [[],
+         [1/5],
+         [3/40, 9/40],
+         [44/45, -56/15, 32/9],
+         [19372/6561, -25360/2187, 64448/6561, -212/729],
+         [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+         [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]]
+    B = [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0]
+    E = [71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40]       # B minus the 4th order weights
+
+    def __init__(self, rtol=1e-9, atol=1e-3):
+        self.rtol = rtol
+        self.atol = atol
+        self.h = None           # Length of the next sub-step
+        self.rejected = 0       # Number of rejected sub-steps
+
+    def reset(self):
+        self.h = None
+
+    def advance(self, physics, pos, vel, acc, masses, n_massive, h):
+        t = 0
+        sub_h = h if self.h is None else min(self.h, h)
+        while t < h:
+            last = sub_h >= h - t
+            if last:
+                sub_h = h - t
+
+            # Stages: k_x holds the position derivatives (velocities), k_v the velocity derivatives (accelerations).
+            k_x, k_v = [vel], [acc]
+            for i in range(1, 7):
+                stage_pos = pos + sub_h*sum(a*k for a, k in zip(self.A[i], k_x) if a != 0)
+                stage_vel = vel + sub_h*sum(a*k for a, k in zip(self.A[i], k_v) if a != 0)
+                k_x.append(stage_vel)
+                k_v.append(physics.gravity(stage_pos, stage_pos, masses, n_massive))
+
+            # The 7th stage is evaluated at the 5th order solution (first same as last).
+            new_pos, new_vel = stage_pos, stage_vel
+            error_pos = sub_h*sum(e*k for e, k in zip(self.E, k_x) if e != 0)
+            error_vel = sub_h*sum(e*k for e, k in zip(self.E, k_v) if e != 0)
+            scale_pos = self.atol + self.rtol*max(np.abs(pos).max(), np.abs(new_pos).max())
+            scale_vel = self.atol + self.rtol*max(np.abs(vel).max(), np.abs(new_vel).max())
+            error = max(np.abs(error_pos).max()/scale_pos, np.abs(error_vel).max()/scale_vel)
+
+            factor = 5 if error == 0 else min(5, max(0.2, 0.9*error**(-1/5)))
+            if error <= 1:
+                t = h if last else t + sub_h
+                pos, vel, acc = new_pos, new_vel, k_v[6]
+                # A shortened final sub-step does not say anything about the next step length.
+                if not last or self.h is None or factor < 1:
+                    self.h = sub_h*factor
+                sub_h = self.h
+            else:
+                self.rejected += 1
+                sub_h *= factor
+        return pos, vel, acc
+
+class BlockHermite(Integrator):
+    """
+    Fourth order Hermite predictor-corrector with hierarchical block time steps. Each body gets its own step h/2**k,
+    chosen from its acceleration and its derivatives with the criterion of Aarseth, and only the bodies whose step
+    ends at the current block time (the active block) are corrected and have their forces evaluated. Bodies on slow
+    orbits therefore take far fewer force evaluations than the ones in close orbits. All bodies are synchronised at
+    the end of every step h, which is the longest allowed individual step.
+    """
+
+    def __init__(self, eta=0.02, max_level=20):
+        """
+        eta: accuracy parameter of the time step criterion
+        max_level: the shortest allowed step is h/2**max_level
+        """
+        self.eta = eta
+        self.max_level = max_level
+        self.reset()
+
+    def reset(self):
+        self.jerk = None        # Jerk of every body at the end of the previous step
+        self.levels = None      # Current step level k of every body
+        self.h = None
+
+    def advance(self, physics, pos, vel, acc, masses, n_massive, h):
+        n = len(pos)
+        self_index = np.where(np.arange(n) < n_massive, np.arange(n), -1)
+        ticks = 2**self.max_level          # Number of the shortest steps in h
+
+        if self.jerk is None or len(self.jerk) != n or self.h != h:
+            # Starting values: the initial step follows from the ratio of acceleration and jerk.
+            acc, jerk = physics.accelerations_and_jerks(pos, vel, pos[:n_massive], vel[:n_massive], masses[:n_massive], self_index)
+            a_norm, j_norm = np.linalg.norm(acc, axis=1), np.linalg.norm(jerk, axis=1)
+            initial = 0.01*np.divide(a_norm, j_norm, out=np.full(n, float(h)), where=j_norm > 0)
+            levels = self.quantize(initial, h)
+        else:
+            jerk, levels = self.jerk, self.levels
+
+        pos, vel, acc, jerk = pos.copy(), vel.copy(), acc.copy(), jerk.copy()
+        time = np.zeros(n, dtype=np.int64)     # Current time of each body in ticks
+        while n > 0:
+            steps = 2**(self.max_level - levels)
+            next_time = time + steps
+            now = next_time.min()
+            if now > ticks:
+                break
+            active = np.nonzero(next_time == now)[0]
+
+            # Predict all bodies to the current block time
+            tau = ((now - time)*(h/ticks))[:, np.newaxis]
+            pred_pos = pos + vel*tau + acc*tau**2/2 + jerk*tau**3/6
+            pred_vel = vel + acc*tau + jerk*tau**2/2
+
+            # Evaluate the forces of the active bodies and correct them
+            a_1, j_1 = physics.accelerations_and_jerks(pred_pos[active], pred_vel[active], pred_pos[:n_massive], pred_vel[:n_massive], masses[:n_massive], self_index[active])
+            dt = tau[active]
+            a_0, j_0 = acc[active], jerk[active]
+            new_vel = vel[active] + (a_0 + a_1)*dt/2 + (j_0 - j_1)*dt**2/12
+            new_pos = pos[active] + (vel[active] + new_vel)*dt/2 + (a_0 - a_1)*dt**2/12
+            pos[active], vel[active], acc[active], jerk[active] = new_pos, new_vel, a_1, j_1
+            time[active] = now
+
+            # Choose the next steps from the Hermite interpolation of the acceleration
+            snap = (-6*(a_0 - a_1) - dt*(4*j_0 + 2*j_1))/dt**2
+            crackle = (12*(a_0 - a_1) + 6*dt*(j_0 + j_1))/dt**3
+            snap = snap + dt*crackle
+            a, j, s, c = (np.linalg.norm(x, axis=1) for x in (a_1, j_1, snap, crackle))
+            numerator, denominator = a*s + j**2, j*c + s**2
+            ideal = np.sqrt(self.eta*np.divide(numerator, denominator, out=np.full(len(active), np.inf), where=denominator > 0))
+            new_levels = self.quantize(ideal, h)
+
+            # A step may only grow by one level at a time, and only if the new step stays in its block.
+            old_levels = levels[active]
+            grow = (new_levels < old_levels) & (now % (2*steps[active]) == 0)
+            levels[active] = np.where(new_levels >= old_levels, new_levels, np.where(grow, old_levels - 1, old_levels))
+
+            if now == ticks:
+                break
+
+        self.jerk, self.levels, self.h = jerk, levels, h
+        return pos, vel, acc
+
+    def quantize(self, steps, h):
+        """Returns the levels k of the longest steps h/2**k that are not longer than the given steps."""
+        with np.errstate(divide='ignore'):
+            levels = np.ceil(np.log2(h/steps))
+        return np.clip(np.nan_to_num(levels, nan=0, posinf=self.max_level, neginf=0), 0, self.max_level).astype(np.int64)
+
+# Integrators that can be chosen with SolarSystem.set_integrator
+INTEGRATORS = {
+    'rk4': RungeKutta4,
+    'leapfrog': Leapfrog,
+    'yoshida4': Yoshida4,
+    'rk45': DormandPrince,
+    'block': BlockHermite,
+}
@@ -4,6 +4,7 @@ from PyQt5.QtWidgets import QApplication
 from solar_system_scene import SolarSystemScene
 import solar_system_file
 from solar_system_error import *
+from error_message import ErrorMessage
 
 def main():
 
@@ -17,6 +18,9 @@ def main():
             except SettingsFileError:
                 msg = ErrorMessage("Error in reading settings file.")
             else:
+                if '--stats' in sys.argv:
+                    # Log the time spent in each phase of the simulation and the redraw every 5 seconds
+                    system.enable_stats(log_every=5)
                 window = gui.GUI(system)
                 sys.exit(app.exec_())
     except IOError:
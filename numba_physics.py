@@ -0,0 +1,116 @@
+import importlib.util
+import numpy as np
+from physics import GRAV_CONSTANT
+from vector_physics import VectorPhysics
+from solar_system_error import SolarSystemError
+
+# Whether Numba is installed. Only its presence is checked here: Numba itself is imported, and the kernels compiled,
+# when the first NumbaPhysics is created, so that importing this module stays cheap.
+AVAILABLE = importlib.util.find_spec('numba') is not None
+
+# Compiled kernels, created by compile_kernels()
+KERNELS = {}
+
+def compile_kernels():
+    """
+    Compiles the pairwise kernels with Numba. The loop over the targets runs in parallel on all CPU cores (or as many
+    as numba.set_num_threads allows). The compiled code is cached on disk, so later processes skip the compilation.
+    """
+    if KERNELS:
+        return KERNELS
+    from numba import njit, prange
+
+    @njit(parallel=True, cache=True)
+    def accelerations(targets, sources, masses, exclude_self, constant):
+        acc = np.zeros((targets.shape[0], 3))
+        for i in prange(targets.shape[0]):
+            ax, ay, az = 0.0, 0.0, 0.0
+            for j in range(sources.shape[0]):
+                if exclude_self and i == j:
+                    continue
+                dx = sources[j, 0] - targets[i, 0]
+                dy = sources[j, 1] - targets[i, 1]
+                dz = sources[j, 2] - targets[i, 2]
+                r_squared = dx*dx + dy*dy + dz*dz
+                factor = constant*masses[j]/(r_squared*np.sqrt(r_squared))
+                ax += factor*dx
+                ay += factor*dy
+                az += factor*dz
+            acc[i, 0], acc[i, 1], acc[i, 2] = ax, ay, az
+        return acc
+
+    @njit(parallel=True, cache=True)
+    def accelerations_and_jerks(targets, target_vel, sources, source_vel, masses, self_index, constant):
+        acc = np.zeros((targets.shape[0], 3))
+        jerk = np.zeros((targets.shape[0], 3))
+        for i in prange(targets.shape[0]):
+            ax, ay, az, jx, jy, jz = 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+            for j in range(sources.shape[0]):
+                if j == self_index[i]:
+                    continue
+                dx = sources[j, 0] - targets[i, 0]
+                dy = sources[j, 1] - targets[i, 1]
+                dz = sources[j, 2] - targets[i, 2]
+                vx = source_vel[j, 0] - target_vel[i, 0]
+                vy = source_vel[j, 1] - target_vel[i, 1]
+                vz = source_vel[j, 2] - target_vel[i, 2]
+                r_squared = dx*dx + dy*dy + dz*dz
+                factor = constant*masses[j]/(r_squared*np.sqrt(r_squared))
+                r_dot_v = 3*(dx*vx + dy*vy + dz*vz)/r_squared
+                ax += factor*dx
+                ay += factor*dy
+                az += factor*dz
+                jx += factor*(vx - r_dot_v*dx)
+                jy += factor*(vy - r_dot_v*dy)
+                jz += factor*(vz - r_dot_v*dz)
+            acc[i, 0], acc[i, 1], acc[i, 2] = ax, ay, az
+            jerk[i, 0], jerk[i, 1], jerk[i, 2] = jx, jy, jz
+        return acc, jerk
+
+    KERNELS['accelerations'] = accelerations
+    KERNELS['accelerations_and_jerks'] = accelerations_and_jerks
+    return KERNELS
+
+class NumbaPhysics(VectorPhysics):
+    """
+    Physics engine with the pairwise loops of VectorPhysics compiled by Numba. Each target sums over the sources in
+    registers instead of building (N, M, 3) displacement arrays, and the targets are spread over all CPU cores.
+    Gives the same results as VectorPhysics within the relative tolerance TOLERANCE.
+    The integrators work on the same state arrays as with VectorPhysics.
+    """
+
+    def __init__(self, threads=None):
+        """threads: number of threads the kernels use (default: one per CPU core)"""
+        super().__init__()
+        if not AVAILABLE:
+            raise SolarSystemError("NumbaPhysics needs Numba, which is not installed.")
+        self.kernels = compile_kernels()
+        if threads is not None:
+            import numba
+            numba.set_num_threads(threads)
+
+    def accelerations(self, targets, sources, masses, exclude_self=False):
+        """Takes the same arguments and returns the same results as VectorPhysics.accelerations."""
+        self.evaluations += len(targets)
+        self.interactions += len(targets)*(len(sources) - 1 if exclude_self else len(sources))
+        if len(targets) == 0 or len(sources) == 0:
+            return np.zeros((len(targets), 3))
+        return self.kernels['accelerations'](np.ascontiguousarray(targets, dtype=float), np.ascontiguousarray(sources, dtype=float),
+                                             np.ascontiguousarray(masses, dtype=float), exclude_self, GRAV_CONSTANT)
+
+    def accelerations_and_jerks(self, targets, target_vel, sources, source_vel, masses, self_index=None):
+        """Takes the same arguments and returns the same results as VectorPhysics.accelerations_and_jerks."""
+        self.evaluations += len(targets)
+        self.interactions += len(targets)*len(sources) - (int(np.count_nonzero(self_index >= 0)) if self_index is not None else 0)
+        if len(targets) == 0 or len(sources) == 0:
+            return np.zeros((len(targets), 3)), np.zeros((len(targets), 3))
+        if self_index is None:
+            self_index = np.full(len(targets), -1)
+        arrays = [np.ascontiguousarray(array, dtype=float) for array in (targets, target_vel, sources, source_vel, masses)]
+        return self.kernels['accelerations_and_jerks'](*arrays, np.ascontiguousarray(self_index, dtype=np.int64), GRAV_CONSTANT)
+
+def default_physics():
+    """Returns the fastest available direct-summation engine: NumbaPhysics if Numba is installed, otherwise VectorPhysics."""
+    if AVAILABLE:
+        return NumbaPhysics()
+    return VectorPhysics()
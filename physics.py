@@ -91,6 +91,7 @@ class Physics:
     def net_force(self, body, celestial_bodies):
         """
         Calculates the net force of gravity affecting body in question.
+        Test particles are skipped, since they do not attract other bodies.
         
         body: target body
         celestial_bodies: list of all bodies in the system (including target body)
@@ -99,6 +100,8 @@ class Physics:
         others = celestial_bodies[:]
         others.remove(body)
         for x in others:
+            if x.is_test_particle():
+                continue
             grav_force = self.gravitational_force(body.get_mass(), x.get_mass(), self.displacement(body.get_position(), x.get_position()))
             for i in range(DIMENSION):
                 net_force[i] += grav_force[i]
@@ -57,16 +57,23 @@ class PlanetGraphicsItem(QGraphicsEllipseItem):
     def get_planet(self):
         return self.planet
 
-    def update_position(self):
-        """Moves the planet and its vectors according to their position in the system."""
+    def update_position(self, state=None):
+        """
+        Moves the planet and its vectors according to their position in the system.
+        state: (position, velocity, acceleration) to draw instead of the current values of the planet, e.g. from a Snapshot
+        """
+        if state is None:
+            state = (self.planet.get_position(), self.planet.get_velocity(), self.planet.get_acceleration())
+        position, velocity, acceleration = state
+
         # Determine new position
-        real_x, real_y = self.planet.get_position()[0], self.planet.get_position()[1]
+        real_x, real_y = position[0], position[1]
         new_x = 500*(self.system_size+real_x)/(2*self.system_size) - self.r
         new_y = 500 - 500*(self.system_size+real_y)/(2*self.system_size) - self.r
 
         # Update vector arrows
-        self.v = self.set_vector_line(self.v, self.planet.get_velocity(), 0.01)
-        self.a = self.set_vector_line(self.a, self.planet.get_acceleration(), 10000)
+        self.v = self.set_vector_line(self.v, velocity, 0.01)
+        self.a = self.set_vector_line(self.a, acceleration, 10000)
 
         # Update vector arrow points
         self.v_point.update_triangle()
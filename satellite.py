@@ -2,8 +2,22 @@ from celestial_body import *
 
 class Satellite(CelestialBody):
 
-    def __init__(self, mass, position, velocity):
+    __slots__ = ()
+
+    def __init__(self, mass, position, velocity, test_particle=False):
         name = None
         radius = 0
         colour = [255, 255, 255]        # white
-        super().__init__(name, mass, radius, position, velocity, colour)
\ No newline at end of file
+        super().__init__(name, mass, radius, position, velocity, colour)
+        self.test_particle = test_particle
+
+    def is_satellite(self):
+        return True
+
+    def set_test_particle(self, boolean):
+        """
+        Sets whether the satellite is a massless test particle. Test particles are attracted by the other bodies, but do not attract anything themselves.
+        """
+        self.test_particle = boolean
+        if self.store is not None:
+            self.store.test_particle[self.index] = boolean
@@ -0,0 +1,109 @@
+"""
+Command line runner that simulates a solar system without the graphical user interface. PyQt5 is never imported.
+
+Usage: python -m simulate [settings file] [--years YEARS] [--dt DAYS] [--integrator NAME] [--continuous] [--output FILE]
+                         [--trajectory PATH] [--cadence STEPS] [--checkpoint FILE] [--checkpoint-every STEPS] [--resume FILE]
+                         [--stats] [--stats-every SECONDS]
+"""
+import time
+START = time.perf_counter()
+
+import sys
+import argparse
+from solar_system import SolarSystem
+from solar_system_file import SolarSystemFile
+from solar_system_error import SettingsFileError
+from integrators import INTEGRATORS
+
+# Time in seconds that importing the simulation modules may take. Runs are often launched by the thousand, so
+# their start-up must not be dominated by imports.
+STARTUP_BUDGET = 0.5
+IMPORT_TIME = time.perf_counter() - START
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(prog='python -m simulate', description='Simulates a solar system without the graphical user interface.')
+    parser.add_argument('settings', nargs='?', default='settings.csv', help='settings file (default: settings.csv)')
+    parser.add_argument('--years', type=float, default=3, help='maximum duration of the simulation in years (default: 3)')
+    parser.add_argument('--dt', type=float, default=1, help='time step in days (default: 1)')
+    parser.add_argument('--integrator', choices=list(INTEGRATORS), default='rk4', help='integrator (default: rk4)')
+    parser.add_argument('--continuous', action='store_true', help='detect collisions along the paths during each time step')
+    parser.add_argument('--output', help='file to write the final state to, in the settings file format')
+    parser.add_argument('--trajectory', help='base path of the trajectory files to record (PATH.npy and PATH.json)')
+    parser.add_argument('--cadence', type=int, default=1, help='record a trajectory frame every this many steps (default: 1)')
+    parser.add_argument('--checkpoint', help='file to save checkpoints to during the run')
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help='save a checkpoint every this many steps (default: 1000)')
+    parser.add_argument('--resume', help='continue from a checkpoint file with its time, time step, lifespan and integrator instead of reading the settings file')
+    parser.add_argument('--stats', action='store_true', help='print the time spent in each phase of the simulation at the end')
+    parser.add_argument('--stats-every', type=float, help='also print it every this many seconds during the run')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET, help='warn if importing takes longer than this many seconds')
+    return parser.parse_args(arguments)
+
+def run(system, checkpoint=None, checkpoint_every=1000):
+    """
+    Runs the simulation until its lifespan is over, two bodies collide or a satellite flies out of the system.
+    If checkpoint is given, the state is saved to that file every checkpoint_every steps and at the end.
+    Returns a message telling why the simulation ended.
+    """
+    steps = 0
+    while system.get_time() < system.get_lifespan() and system.impact_status() == False and system.satellites_status() == True:
+        system.next_time_step()
+        system.check_impact()
+        system.check_satellites()
+        steps += 1
+        if checkpoint is not None and steps % checkpoint_every == 0:
+            system.save_checkpoint(checkpoint)
+    if checkpoint is not None:
+        system.save_checkpoint(checkpoint)
+
+    if system.impact_status() == True:
+        return 'Simulation ended by collision'
+    elif system.satellites_status() == False:
+        return 'Satellite flew away from system'
+    return 'Simulation over'
+
+def main(arguments=None):
+    args = parse_arguments(arguments)
+    if IMPORT_TIME > args.startup_budget:
+        print("Warning: importing took {:.3f} s, more than the budget of {:.3f} s".format(IMPORT_TIME, args.startup_budget), file=sys.stderr)
+
+    reader = SolarSystemFile()
+    if args.resume is not None:
+        system = SolarSystem()
+        try:
+            system.load_checkpoint(args.resume)
+        except IOError:
+            print("Could not open checkpoint file.", file=sys.stderr)
+            return 1
+    else:
+        try:
+            with open(args.settings, 'r') as file:
+                system = reader.read_settings_file(file)
+        except IOError:
+            print("Could not open settings file.", file=sys.stderr)
+            return 1
+        except SettingsFileError as error:
+            print("Error in reading settings file: {}".format(error.message), file=sys.stderr)
+            return 1
+
+        system.set_lifespan(args.years*365*24*60*60)
+        system.set_time_step(args.dt*24*60*60)
+        system.set_integrator(args.integrator)
+    system.set_continuous_collisions(args.continuous)
+    if args.stats or args.stats_every is not None:
+        system.enable_stats(args.stats_every)
+
+    if args.trajectory is not None:
+        system.record_trajectory(args.trajectory, args.cadence)
+    message = run(system, args.checkpoint, args.checkpoint_every)
+    system.stop_recording()
+    print('{}. Time elapsed: {:3.2f} years'.format(message, system.get_time()/315.36e5))
+    if system.get_stats() is not None:
+        print(system.get_stats().summary())
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            reader.write_settings_file(system, file)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
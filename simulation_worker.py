@@ -0,0 +1,65 @@
+import threading
+import time
+
+class Snapshot:
+    """
+    Copy of the state of a SolarSystem at one moment, handed over from the simulation thread to the GUI.
+    """
+
+    def __init__(self, system):
+        self.time = system.get_time()
+        pos, vel, acc, masses = system.store.get_arrays()
+        self.rows = {body: i for i, body in enumerate(system.get_all_bodies())}
+        self.pos, self.vel, self.acc = pos.tolist(), vel.tolist(), acc.tolist()
+
+    def get_time(self):
+        return self.time
+
+    def get_state(self, body):
+        """Returns the position, velocity and acceleration of body."""
+        i = self.rows[body]
+        return self.pos[i], self.vel[i], self.acc[i]
+
+class SimulationWorker(threading.Thread):
+    """
+    Thread that advances a SolarSystem as fast as it can until its lifespan is over, two bodies collide, a satellite
+    flies out of the system or stop() is called.
+
+    The newest state is published as a Snapshot without locks: the worker only creates a snapshot when the reader has
+    taken the previous one, and handing it over is a single reference assignment. The reader therefore always gets a
+    consistent state, intermediate states are skipped, and copying costs nothing while nobody is drawing.
+    """
+
+    def __init__(self, system):
+        super().__init__(daemon=True)
+        self.system = system
+        self.running = True
+        self.finished = False
+        self.snapshot = None
+        self.steps = 0
+
+    def run(self):
+        system = self.system
+        while self.running and system.get_time() < system.get_lifespan() and system.impact_status() == False and system.satellites_status() == True:
+            system.next_time_step()
+            system.check_impact()
+            system.check_satellites()
+            self.steps += 1
+            if self.snapshot is None:
+                if system.stats is not None:
+                    start = time.perf_counter()
+                    self.snapshot = Snapshot(system)
+                    system.stats.add('snapshot', time.perf_counter() - start)
+                else:
+                    self.snapshot = Snapshot(system)
+        self.finished = True
+
+    def take(self):
+        """Returns the newest unread snapshot, or None if there is none."""
+        snapshot = self.snapshot
+        self.snapshot = None
+        return snapshot
+
+    def stop(self):
+        """Asks the thread to stop after the current time step."""
+        self.running = False
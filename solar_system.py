@@ -1,11 +1,22 @@
 from celestial_body import CelestialBody
-from satellite import Satellite
-from physics import Physics, DIMENSION
+from body_store import BodyStore
+from vector_physics import VectorPhysics
+from numba_physics import default_physics
+from integrators import INTEGRATORS
+from solar_system_error import SolarSystemError
+from trajectory import TrajectoryWriter
+from collision import sweep_and_prune, swept_impact
+from stats import Stats
+import checkpoint
+import numpy as np
+import os
+import time
 
 class SolarSystem:
 
     def __init__(self):
-        self.celestial_bodies = []
+        self.store = BodyStore()            # Arrays holding the state of the bodies
+        self.celestial_bodies = self.store.bodies
         self.solar_system_size = (0,0)      # (min, max) coordinates
 
         # Current time, time step of the simulation and the maximum duration of the simulation, all in seconds.
@@ -15,40 +26,73 @@ class SolarSystem:
 
         self.satellites_inside_system = True
         self.impact = False
-        self.physics = Physics()
+        self.impact_bodies = None           # The two bodies that collided
+        self.impact_time = None
+        self.continuous_collisions = False
+        self.previous_state = None          # Positions and velocities at the start of the latest time step
+        self.physics = default_physics()        # NumbaPhysics if Numba is installed, otherwise VectorPhysics
+        self.integrator = INTEGRATORS['rk4']()
+        self.trajectory = None
+        self.stats = None                   # Stats of the simulation loop, if enabled
 
         self.saved_bodies = []
-        self.saved_state = []
+        self.saved_state = None             # Positions, velocities and accelerations of the saved bodies
     
     def save_state(self):
         """
-        Saves the current bodies in the system and their physical parameters.
+        Saves the current bodies in the system and their physical parameters. Replaces any previously saved state.
         """
-        for body in self.celestial_bodies:
-            self.saved_bodies.append(body)
-            pos, vel, acc = body.get_position(), body.get_velocity(), body.get_acceleration()
-            self.saved_state.append([pos, vel, acc])
+        self.saved_bodies = list(self.celestial_bodies)
+        pos, vel, acc, masses = self.store.get_arrays()
+        self.saved_state = (pos.copy(), vel.copy(), acc.copy())
     
     def return_to_saved_state(self):
         """
         Compares the current system to the saved state, removes any bodies that have since been added and sets the remaining bodies back to their saved states (position, speed etc.).
         """
-        to_be_removed = []
-        for body in self.celestial_bodies:
-            if body not in self.saved_bodies:
-                to_be_removed.append(body)
-        for body in to_be_removed:
-            self.celestial_bodies.remove(body)
-        for i in range(len(self.celestial_bodies)):
-            body = self.celestial_bodies[i]
-            body.update_position(self.saved_state[i][0])
-            body.update_velocity(self.saved_state[i][1])
-            body.update_acceleration(self.saved_state[i][2])
+        saved = set(self.saved_bodies)
+        if len(saved) < self.store.n:
+            self.store.keep(np.array([body in saved for body in self.celestial_bodies], dtype=bool))
+        if self.saved_state is not None:
+            pos, vel, acc, masses = self.store.get_arrays()
+            pos[:], vel[:], acc[:] = self.saved_state
         
+        self.integrator.reset()
+
         # Resets possible simulation-stopping events.
         self.set_satellite_status(True)
         self.impact = False
+        self.impact_bodies = None
+        self.impact_time = None
+        self.previous_state = None
     
+    def checkpoint(self):
+        """
+        Returns the full state of the system (bodies, time, time step, lifespan, status flags) as a compact binary blob.
+        """
+        return checkpoint.serialize(self)
+
+    def restore(self, data):
+        """Sets the system to the state of a blob returned by checkpoint()."""
+        checkpoint.restore(self, data)
+
+    def save_checkpoint(self, path):
+        """Writes a checkpoint to the file path. The file is replaced only once the new checkpoint has been written completely."""
+        with open(path + '.tmp', 'wb') as file:
+            file.write(self.checkpoint())
+        os.replace(path + '.tmp', path)
+
+    def load_checkpoint(self, path):
+        """Sets the system to the state saved in the checkpoint file path."""
+        with open(path, 'rb') as file:
+            self.restore(file.read())
+
+    def set_bodies(self, celestial_bodies):
+        """Replaces all bodies in the system with celestial_bodies."""
+        self.store.clear()
+        for body in celestial_bodies:
+            self.store.add(body)
+
     def set_satellite_status(self, boolean):
         self.satellites_inside_system = boolean
     
@@ -66,6 +110,12 @@ class SolarSystem:
     
     def get_size(self):
         return self.solar_system_size
+
+    def get_physics(self):
+        return self.physics
+
+    def get_integrator(self):
+        return self.integrator
     
     def get_time(self):
         return self.t
@@ -76,47 +126,92 @@ class SolarSystem:
     def impact_status(self):
         return self.impact
 
+    def get_impact(self):
+        """
+        Returns the two bodies that collided and the time of the collision, or None if there has been no collision.
+        """
+        if self.impact_bodies is None:
+            return None
+        return self.impact_bodies[0], self.impact_bodies[1], self.impact_time
+
     def satellites_status(self):
         return self.satellites_inside_system
 
     def next_time_step(self):
-        """Moves time forward by 1 time step and calls the Runge-Kutta-4-method to update the situation of the system."""
-        self.celestial_bodies = self.physics.rk4(self.celestial_bodies, self.dt)
+        """Moves time forward by 1 time step and calls the chosen integrator (by default the Runge-Kutta-4-method) to update the situation of the system."""
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        if self.continuous_collisions:
+            self.previous_state = self.get_state_arrays()
+        self.integrator.step(self.physics, self.celestial_bodies, self.dt)
         self.t += self.dt
+        if stats is not None:
+            stats.add('integration', time.perf_counter() - start)
+        if self.trajectory is not None:
+            if stats is not None:
+                start = time.perf_counter()
+            self.trajectory.record(self)
+            if stats is not None:
+                stats.add('trajectory', time.perf_counter() - start)
+        if stats is not None:
+            stats.step()
     
     def check_impact(self):
         """
-        Checks if any objects in the solar system have collided.
+        Checks if any objects in the solar system have collided. The colliding pair and the time are saved, see get_impact().
+        Uses sweep-and-prune on the bounding spheres, so the check stays close to O(N) instead of testing all pairs.
+        With continuous collision detection the whole latest time step is checked, and the time of impact is located within it.
         """
-        for i in range(len(self.celestial_bodies)):
-            for j in range(len(self.celestial_bodies)):
-                if i < j:
-                    body1 = self.celestial_bodies[i]
-                    body2 = self.celestial_bodies[j]
-                    if self.physics.abs_distance(body1.get_position(), body2.get_position()) <= body1.get_radius() + body2.get_radius():
-                        self.impact = True
+        if self.stats is not None:
+            start = time.perf_counter()
+        bodies = self.celestial_bodies
+        positions, velocities = self.get_state_arrays()
+        radii = self.store.radius[:self.store.n]
+        if self.continuous_collisions and self.previous_state is not None and len(self.previous_state[0]) == len(bodies):
+            impact = swept_impact(self.previous_state[0], self.previous_state[1], positions, velocities, radii, self.dt)
+            if impact is not None:
+                self.impact = True
+                self.impact_bodies = (bodies[impact[0]], bodies[impact[1]])
+                self.impact_time = self.t - self.dt + impact[2]*self.dt
+        else:
+            pair = sweep_and_prune(positions, radii)
+            if pair is not None:
+                self.impact = True
+                self.impact_bodies = (bodies[pair[0]], bodies[pair[1]])
+                self.impact_time = self.t
+        if self.stats is not None:
+            self.stats.add('check_impact', time.perf_counter() - start)
+
+    def get_state_arrays(self):
+        """Returns the positions and velocities of all bodies as (N, 3) arrays."""
+        pos, vel, acc, masses = self.store.get_arrays()
+        return pos.copy(), vel.copy()
 
     def check_satellites(self):
         """
         Checks if a satellite has flown out of the system.
         """
-        for body in self.celestial_bodies:
-            if isinstance(body, Satellite):
-                for i in range(DIMENSION):
-                    if body.get_position()[i] < self.solar_system_size[0] or body.get_position()[i] > self.solar_system_size[1]:
-                        self.satellites_inside_system = False
+        if self.stats is not None:
+            start = time.perf_counter()
+        n = self.store.n
+        satellites = self.store.pos[:n][self.store.satellite[:n]]
+        if satellites.size > 0 and (satellites.min() < self.solar_system_size[0] or satellites.max() > self.solar_system_size[1]):
+            self.satellites_inside_system = False
+        if self.stats is not None:
+            self.stats.add('check_satellites', time.perf_counter() - start)
 
     def add_to_system(self, body):
         """
-        Adds a body to the solar system.
+        Adds a body to the solar system. Its state is moved into the arrays of the system.
         """
-        self.celestial_bodies.append(body)
+        self.store.add(body)
     
     def remove_from_system(self, body):
         """
-        Removes a body from the solar system.
+        Removes a body from the solar system. The body keeps its last state.
         """
-        self.celestial_bodies.remove(body)
+        self.store.remove(body)
     
     def set_size(self, size):
         """
@@ -124,6 +219,70 @@ class SolarSystem:
         """
         self.solar_system_size = size
     
+    def set_physics(self, physics):
+        """
+        Sets the physics engine used to advance the system, e.g. NumbaPhysics, VectorPhysics or Physics.
+        All integrators except 'rk4' need VectorPhysics or one of its subclasses.
+        """
+        self.physics = physics
+        if self.stats is not None:
+            self.stats.attach(physics)
+
+    def set_integrator(self, name, **options):
+        """
+        Chooses the integrator by its name in INTEGRATORS ('rk4', 'leapfrog', 'yoshida4', 'rk45' or 'block').
+        Options are passed on to the integrator, e.g. set_integrator('rk45', rtol=1e-10).
+        If the integrator needs state arrays and the current physics engine is the plain Physics, it is replaced with default_physics().
+        """
+        if name not in INTEGRATORS:
+            raise SolarSystemError("Unknown integrator: {}".format(name))
+        self.integrator = INTEGRATORS[name](**options)
+        if self.integrator.needs_arrays and not isinstance(self.physics, VectorPhysics):
+            self.set_physics(default_physics())
+
+    def record_trajectory(self, path, cadence=1, **options):
+        """
+        Starts streaming the states of all bodies to the trajectory files path.npy and path.json, beginning with the current state.
+        A frame is recorded every cadence time steps. Options are passed on to TrajectoryWriter.
+        """
+        self.stop_recording()
+        self.trajectory = TrajectoryWriter(path, self.celestial_bodies, cadence, **options)
+        self.trajectory.add_frame(self)
+
+    def stop_recording(self):
+        """Writes the rest of the recorded trajectory and closes its file."""
+        if self.trajectory is not None:
+            self.trajectory.close()
+            self.trajectory = None
+
+    def enable_stats(self, log_every=None, stream=None):
+        """
+        Starts collecting counters and timers for the phases of the simulation loop and returns the Stats object.
+        If log_every is given, a summary line is written to stream (default: standard error) every log_every seconds.
+        """
+        self.disable_stats()
+        self.stats = Stats(log_every, stream)
+        self.stats.attach(self.physics)
+        return self.stats
+
+    def disable_stats(self):
+        """Stops collecting statistics. The loop then runs without any measurements."""
+        if self.stats is not None:
+            self.stats.detach()
+            self.stats = None
+
+    def get_stats(self):
+        """Returns the Stats object, or None if statistics are not collected."""
+        return self.stats
+
+    def set_continuous_collisions(self, boolean):
+        """
+        Sets whether collisions are searched along the paths of the bodies during each time step instead of only at its end.
+        This catches fast bodies that would pass through each other between two steps, so coarse steps can be used.
+        """
+        self.continuous_collisions = boolean
+        self.previous_state = None
+
     def set_time_step(self, time_step):
         """
         Set the time step of the simulation (in seconds).
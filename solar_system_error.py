@@ -1,15 +1,6 @@
-from PyQt5.QtWidgets import QMessageBox
-
 class SolarSystemError(Exception):
     pass
 
 class SettingsFileError(SolarSystemError):
     def __init__(self, message):
-        self.message = message
-
-class ErrorMessage(QMessageBox):
-    def __init__(self, message):
-        super().__init__()
-        self.setText(message)
-        self.setWindowTitle("Error")
-        self.exec()
\ No newline at end of file
+        self.message = message
\ No newline at end of file
@@ -2,17 +2,55 @@ from solar_system import SolarSystem
 from celestial_body import CelestialBody
 from solar_system_error import SettingsFileError
 from physics import DIMENSION, LIGHTSPEED, Physics
+from vector_physics import VectorPhysics
+from collision import sweep_and_prune
 from random import randrange
+import numpy as np
 
 class SolarSystemFile:
 
-    def read_settings_file(self, file):
+    def read_settings_file(self, file, physics=None):
         """
         Reads the settings file and returns the solar system object created based on it.
+        The file is parsed into columns first, so that overlaps are checked with one sweep-and-prune pass and the initial
+        accelerations are calculated in one batched pass, which keeps loading large catalogues fast.
+
+        physics: engine for the initial accelerations (default: VectorPhysics), e.g. BarnesHutPhysics for very large files
         """
+        columns = self.read_columns(file)
+
+        # Check that no bodies overlap
+        if sweep_and_prune(columns['positions'], columns['radii']) is not None:
+            raise SettingsFileError("2 bodies too close to each other.")
+
+        # Calculate the initial accelerations for all bodies
+        positions = columns['positions']
+        if physics is None:
+            physics = VectorPhysics()
+        accelerations = physics.accelerations(positions, positions, columns['masses'], True).tolist()
 
-        physics = Physics()
         system = SolarSystem()
+        names, masses, radii = columns['names'], columns['masses'].tolist(), columns['radii'].tolist()
+        positions, velocities, colours = positions.tolist(), columns['velocities'].tolist(), columns['colours']
+        for i in range(len(names)):
+            body = CelestialBody(names[i], masses[i], radii[i], positions[i], velocities[i], colours[i])
+            body.update_acceleration(accelerations[i])
+            system.add_to_system(body)
+
+        system.set_size(self.determine_system_size(system))
+
+        # Save the initial state of the system
+        system.save_state()
+
+        return system
+
+    def read_columns(self, file):
+        """
+        Parses and validates the settings file into columns. Returns a dict with the lists 'names' and 'colours' and
+        the arrays 'masses', 'radii' (N,), 'positions' and 'velocities' (N, 3).
+        """
+        physics = Physics()
+        names, masses, radii, positions, velocities, colours = [], [], [], [], [], []
 
         for orig_line in file:
             line = orig_line.split(',')
@@ -50,42 +88,44 @@ class SolarSystemFile:
             position, velocity, colour = vectors[0], vectors[1], vectors[2]
             if len(position) != DIMENSION or len(velocity) != DIMENSION:
                 raise SettingsFileError("Position: {} or velocity: {} is wrong dimension".format(position, velocity))
-            
-            # Create the read body
-            body = CelestialBody(name, mass, radius, position, velocity, colour)
-            if physics.speed(body) >= LIGHTSPEED:
-                raise SettingsFileError("Speed of body ({}) more than speed of light.".format(physics.speed(body)))
 
-            # Add to system and check that it doesn't overlap with another body
-            system.add_to_system(body)
-            system.check_impact()
-            if system.impact == True:
-                raise SettingsFileError("2 bodies too close to each other.")
-        
-        system.set_size(self.determine_system_size(system))
+            speed = physics.vector_length(velocity)
+            if speed >= LIGHTSPEED:
+                raise SettingsFileError("Speed of body ({}) more than speed of light.".format(speed))
 
-        # Calculate the initial accelerations for all bodies
-        for body in system.get_all_bodies():
-            sigma_f = physics.net_force(body, system.get_all_bodies())
-            a = physics.acceleration(sigma_f, body.get_mass())
-            body.update_acceleration(a)
-        # Save the initial state of the system
-        system.save_state()
+            names.append(name)
+            masses.append(mass)
+            radii.append(radius)
+            positions.append(position)
+            velocities.append(velocity)
+            colours.append(colour)
 
-        return system
+        return {
+            'names': names,
+            'masses': np.array(masses, dtype=float),
+            'radii': np.array(radii, dtype=float),
+            'positions': np.array(positions, dtype=float).reshape(-1, DIMENSION),
+            'velocities': np.array(velocities, dtype=float).reshape(-1, DIMENSION),
+            'colours': colours,
+        }
     
+    def write_settings_file(self, system, file):
+        """
+        Writes the current state of the system to file in the same format that read_settings_file reads, so that a simulation can be continued from it.
+        Bodies without a name (satellites) are written as 'Satellite'.
+        """
+        for body in system.get_all_bodies():
+            name = body.get_name() if body.get_name() is not None else 'Satellite'
+            vectors = [body.get_position(), body.get_velocity(), body.get_colour()]
+            vectors = [':'.join(str(component) for component in vector) for vector in vectors]
+            file.write("{},{},{},{},{},{}\n".format(name, body.get_mass(), body.get_radius(), vectors[0], vectors[1], vectors[2]))
+
     def determine_system_size(self, system):
         """
         Given the list of celestial bodies, determines the size of the solar system, which is a cube 75 % larger than the distance of the furthest object from the origin (sun).
         """
-        max_distance = [0 for i in range(DIMENSION)]
-        for body in system.get_all_bodies():
-            pos = body.get_position()
-            for i in range(DIMENSION):
-                if abs(pos[i]) > max_distance[i]:
-                    max_distance[i] = abs(pos[i])
-        system_size_max = [1.75*max_distance[i] for i in range(DIMENSION)]
-        system_size_max = max(system_size_max)
+        positions = system.store.pos[:system.store.n]
+        system_size_max = 1.75*float(np.abs(positions).max()) if len(positions) > 0 else 0.0
         if system_size_max == 0.0:
             system_size_max = 30.1*149597870700
         return (-system_size_max, system_size_max)
\ No newline at end of file
@@ -39,12 +39,16 @@ class SolarSystemScene(QGraphicsScene):
             self.removeItem(planet_item)
             self.planet_items.remove(planet_item)
     
-    def update_planets(self):
+    def update_planets(self, snapshot=None):
         """
         Updates the position of all PlanetGraphicItems in the scene.
+        snapshot: Snapshot of the system to draw instead of its current state
         """
         for planet_item in self.planet_items:
-            planet_item.update_position()
+            if snapshot is None:
+                planet_item.update_position()
+            else:
+                planet_item.update_position(snapshot.get_state(planet_item.get_planet()))
 
 class SolarSystemView(QGraphicsView):
 
@@ -0,0 +1,117 @@
+import sys
+import time
+
+# Phases whose wall time is measured. 'integration' is the whole integrator step, including the 'forces' evaluated in it.
+PHASES = ('integration', 'forces', 'check_impact', 'check_satellites', 'trajectory', 'snapshot', 'update_planets')
+
+class Stats:
+    """
+    Counters and timers for the phases of the simulation loop: the wall time and number of calls of each phase in PHASES,
+    the number of time steps, force evaluations (bodies whose acceleration was evaluated) and pair interactions.
+
+    SolarSystem.enable_stats() creates one. While it is attached to a physics engine, the force methods of the engine
+    are wrapped with timers; nothing is measured and no wrapper is installed while the stats are disabled.
+    """
+
+    def __init__(self, log_every=None, stream=None):
+        """
+        log_every: if given, a summary line is written every log_every seconds of wall time
+        stream: file the summary lines are written to (default: sys.stderr)
+        """
+        self.log_every = log_every
+        self.stream = stream
+        self.physics = None
+        self.reset()
+
+    def reset(self):
+        """Sets all counters and timers to zero."""
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.steps = 0
+        self.evaluations = 0
+        self.interactions = 0
+        self.start = time.perf_counter()
+        self.last_log = self.start
+
+    def add(self, phase, seconds):
+        """Adds one call of phase that took seconds of wall time."""
+        self.times[phase] += seconds
+        self.calls[phase] += 1
+
+    def step(self):
+        """Counts a time step and writes a summary line if log_every seconds have passed since the previous one."""
+        self.steps += 1
+        if self.log_every is not None:
+            now = time.perf_counter()
+            if now - self.last_log >= self.log_every:
+                self.last_log = now
+                print(self.summary(), file=self.stream if self.stream is not None else sys.stderr)
+
+    def attach(self, physics):
+        """
+        Starts measuring the force evaluations of physics. The force methods of the engine (accelerations and
+        accelerations_and_jerks for VectorPhysics and its subclasses, net_force for Physics) are replaced on the
+        instance with timed wrappers, which also count the evaluations and interactions.
+        """
+        self.detach()
+        self.physics = physics
+        for name in ('accelerations', 'accelerations_and_jerks'):
+            if hasattr(physics, name):
+                setattr(physics, name, self.timed(getattr(physics, name)))
+        if not hasattr(physics, 'accelerations'):
+            setattr(physics, 'net_force', self.timed_net_force(physics.net_force))
+
+    def detach(self):
+        """Stops measuring the force evaluations and restores the methods of the engine."""
+        if self.physics is not None:
+            for name in ('accelerations', 'accelerations_and_jerks', 'net_force'):
+                self.physics.__dict__.pop(name, None)
+            self.physics = None
+
+    def timed(self, method):
+        """Wraps a force method of an array engine, which counts its own evaluations and interactions."""
+        physics = self.physics
+        def wrapper(*args, **kwargs):
+            evaluations, interactions = physics.evaluations, physics.interactions
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            self.add('forces', time.perf_counter() - start)
+            self.evaluations += physics.evaluations - evaluations
+            self.interactions += physics.interactions - interactions
+            return result
+        return wrapper
+
+    def timed_net_force(self, method):
+        """Wraps Physics.net_force, which evaluates the force on one body from all others."""
+        def wrapper(body, celestial_bodies):
+            start = time.perf_counter()
+            result = method(body, celestial_bodies)
+            self.add('forces', time.perf_counter() - start)
+            self.evaluations += 1
+            self.interactions += len(celestial_bodies) - 1
+            return result
+        return wrapper
+
+    def report(self):
+        """
+        Returns the statistics as a dict: the elapsed wall time, the number of steps, evaluations and interactions and
+        their rates per second of force evaluation, and for each phase its total time, calls and mean time per call.
+        """
+        forces = self.times['forces']
+        return {
+            'elapsed': time.perf_counter() - self.start,
+            'steps': self.steps,
+            'evaluations': self.evaluations,
+            'interactions': self.interactions,
+            'evaluations_per_second': self.evaluations/forces if forces > 0 else 0.0,
+            'interactions_per_second': self.interactions/forces if forces > 0 else 0.0,
+            'phases': {phase: {'time': self.times[phase], 'calls': self.calls[phase],
+                               'mean': self.times[phase]/self.calls[phase] if self.calls[phase] > 0 else 0.0} for phase in PHASES},
+        }
+
+    def summary(self):
+        """Returns a one-line summary: steps per second and the share of the elapsed time spent in each phase."""
+        elapsed = max(time.perf_counter() - self.start, 1e-12)
+        shares = ' '.join('{} {:.0%}'.format(phase, self.times[phase]/elapsed) for phase in PHASES if self.calls[phase] > 0)
+        return '{} steps ({:.1f}/s), {} evaluations, {} interactions; {}'.format(
+            self.steps, self.steps/elapsed, self.evaluations, self.interactions, shares)
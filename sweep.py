@@ -0,0 +1,146 @@
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from solar_system import SolarSystem
+from solar_system_file import SolarSystemFile
+from celestial_body import CelestialBody
+from satellite import Satellite
+from physics import Physics, DIMENSION, LIGHTSPEED
+
+# Columns of one body in the shared state array: mass, radius, position, velocity, acceleration and colour.
+COLUMNS = 2 + 4*DIMENSION
+
+# Planetary state of the worker process, attached to the shared memory by attach()
+WORKER = {}
+
+def grid(masses, positions, velocities):
+    """
+    Returns the satellite initial conditions (mass, position, velocity) for every combination of the given masses, positions and velocities.
+    """
+    return [(mass, list(position), list(velocity)) for mass, position, velocity in itertools.product(masses, positions, velocities)]
+
+def sweep(settings, satellites, years=3, dt=1, integrator='rk4', test_particles=False, workers=None):
+    """
+    Simulates the system of the settings file once for each satellite, in parallel over a process pool.
+    The settings file is read only once: the planetary initial state is shared with the workers through shared memory.
+    Returns a list with one result (a dict, see run_satellite) per satellite, in the same order.
+
+    settings: path of the settings file
+    satellites: list of (mass, position, velocity) tuples, the same values GUI.add_satellite takes, e.g. from grid()
+    years: maximum duration of each simulation in years
+    dt: time step in days
+    integrator: name of the integrator in INTEGRATORS
+    test_particles: if True, the satellites are massless test particles
+    workers: number of worker processes (default: number of CPUs)
+    """
+    with open(settings, 'r') as file:
+        system = SolarSystemFile().read_settings_file(file)
+    bodies = system.get_all_bodies()
+
+    memory = shared_memory.SharedMemory(create=True, size=max(1, len(bodies)*COLUMNS*8))
+    try:
+        state = np.ndarray((len(bodies), COLUMNS), dtype=float, buffer=memory.buf)
+        for i in range(len(bodies)):
+            body = bodies[i]
+            state[i] = [body.get_mass(), body.get_radius()] + list(body.get_position()) + list(body.get_velocity()) + list(body.get_acceleration()) + list(body.get_colour())
+        names = [body.get_name() for body in bodies]
+        parameters = (years*365*24*60*60, dt*24*60*60, integrator, test_particles, system.get_size())
+
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(satellites)//(4*workers))
+        with ProcessPoolExecutor(workers, initializer=attach, initargs=(memory.name, names, parameters)) as executor:
+            results = list(executor.map(run_satellite, satellites, chunksize=chunksize))
+        del state
+    finally:
+        memory.close()
+        memory.unlink()
+    return results
+
+def attach(memory_name, names, parameters):
+    """Initialises a worker process: attaches to the shared planetary state."""
+    memory = shared_memory.SharedMemory(name=memory_name)
+    WORKER['memory'] = memory
+    WORKER['state'] = np.ndarray((len(names), COLUMNS), dtype=float, buffer=memory.buf)
+    WORKER['names'] = names
+    WORKER['parameters'] = parameters
+
+def build_system(state, names, size):
+    """Creates a SolarSystem from the shared planetary state."""
+    system = SolarSystem()
+    for i in range(len(names)):
+        row = state[i].tolist()
+        body = CelestialBody(names[i], row[0], row[1], row[2:2 + DIMENSION], row[2 + DIMENSION:2 + 2*DIMENSION], [int(c) for c in row[2 + 3*DIMENSION:]])
+        body.update_acceleration(row[2 + 2*DIMENSION:2 + 3*DIMENSION])
+        system.add_to_system(body)
+    system.set_size(size)
+    return system
+
+def run_satellite(satellite):
+    """
+    Simulates the shared system with one added satellite. Returns the result as a dict with the keys
+    mass, position, velocity: initial conditions of the satellite
+    status: 'impact', 'escape', 'over' or the reason why the satellite could not be added
+    impact, escape: whether the simulation ended by a collision or by the satellite flying out of the system
+    closest_body, closest_distance, closest_time: the body that the satellite came closest to, the distance and the time
+    end_time, end_position, end_velocity: the time and the state of the satellite at the end
+    """
+    mass, position, velocity = satellite
+    lifespan, dt, integrator, test_particles, size = WORKER['parameters']
+    result = {'mass': mass, 'position': list(position), 'velocity': list(velocity), 'status': 'over', 'impact': False, 'escape': False,
+              'closest_body': None, 'closest_distance': float('inf'), 'closest_time': 0, 'end_time': 0, 'end_position': list(position), 'end_velocity': list(velocity)}
+
+    physics = Physics()
+    system = build_system(WORKER['state'], WORKER['names'], size)
+    body = Satellite(mass, list(position), list(velocity), test_particles)
+    if mass <= 0:
+        result['status'] = 'Mass must be positive.'
+        return result
+    if physics.speed(body) >= LIGHTSPEED:
+        result['status'] = 'The speed of a satellite cannot be more than the speed of light.'
+        return result
+    system.add_to_system(body)
+    system.check_satellites()
+    if system.satellites_status() == False:
+        result['status'] = 'Satellite is too far away.'
+        return result
+    body.update_acceleration(physics.acceleration(physics.net_force(body, system.get_all_bodies()), body.get_mass()))
+
+    system.set_lifespan(lifespan)
+    system.set_time_step(dt)
+    system.set_integrator(integrator)
+
+    others = system.get_all_bodies()[:-1]
+    while True:
+        # Track the closest approach to any other body
+        positions = np.array([other.get_position() for other in others])
+        distances = np.sqrt(((positions - body.get_position())**2).sum(axis=1))
+        closest = int(distances.argmin())
+        if distances[closest] < result['closest_distance']:
+            result['closest_body'] = others[closest].get_name()
+            result['closest_distance'] = float(distances[closest])
+            result['closest_time'] = system.get_time()
+
+        if system.get_time() >= system.get_lifespan() or system.impact_status() == True or system.satellites_status() == False:
+            break
+        system.next_time_step()
+        system.check_impact()
+        system.check_satellites()
+
+    if system.impact_status() == True:
+        result['status'], result['impact'] = 'impact', True
+    elif system.satellites_status() == False:
+        result['status'], result['escape'] = 'escape', True
+    result['end_time'] = system.get_time()
+    result['end_position'] = list(body.get_position())
+    result['end_velocity'] = list(body.get_velocity())
+    return result
+
+def write_table(results, file):
+    """Writes the results of a sweep to file as a CSV table, with vectors in the x:y:z format of the settings file."""
+    keys = ['mass', 'position', 'velocity', 'status', 'impact', 'escape', 'closest_body', 'closest_distance', 'closest_time', 'end_time', 'end_position', 'end_velocity']
+    file.write(','.join(keys) + '\n')
+    for result in results:
+        values = [':'.join(str(c) for c in result[key]) if isinstance(result[key], list) else str(result[key]) for key in keys]
+        file.write(','.join(values) + '\n')
@@ -1,10 +1,26 @@
 import unittest
+import subprocess
+import sys
+import os
+import tempfile
 from io import StringIO
 
 from celestial_body import CelestialBody
+from satellite import Satellite
 from solar_system_file import SolarSystemFile
-from solar_system_error import SettingsFileError
+from solar_system import SolarSystem
+from solar_system_error import SettingsFileError, SolarSystemError
 from physics import Physics
+from vector_physics import VectorPhysics, TOLERANCE
+from barnes_hut import BarnesHutPhysics
+import numba_physics
+import simulate
+import benchmark
+from trajectory import Trajectory
+import sweep
+from collision import sweep_and_prune, hermite
+from simulation_worker import SimulationWorker
+import numpy as np
 from math import sqrt
 
 class TestPhysics(unittest.TestCase):
@@ -33,6 +49,389 @@ class TestPhysics(unittest.TestCase):
         for i in range(3):
             self.assertAlmostEqual(expected[i], calculated[i], 3)
 
+class TestVectorPhysics(unittest.TestCase):
+
+    test_data = "Sun,1.989E30,696E6,0:0:0,0:0:0,255:255:0\n" + "Mercury,3.3E23,2439E3,57.9E9:0:0,0:47.39E3:0,186:169:145\n" + "Earth,5.9722E24,637E4,150E9:0:1E9,0:29.73E3:0,0:255:0\n"
+
+    def assert_same_state(self, bodies1, bodies2, tolerance):
+        for body1, body2 in zip(bodies1, bodies2):
+            for vectors in [(body1.get_position(), body2.get_position()), (body1.get_velocity(), body2.get_velocity()), (body1.get_acceleration(), body2.get_acceleration())]:
+                scale = max(abs(c) for c in vectors[0]) or 1
+                for i in range(3):
+                    self.assertLessEqual(abs(vectors[0][i] - vectors[1][i]), tolerance*scale)
+
+    def test_rk4_matches_physics(self):
+        reader = SolarSystemFile()
+        reference = reader.read_settings_file(StringIO(self.test_data))
+        vectorised = reader.read_settings_file(StringIO(self.test_data))
+        vectorised.set_physics(VectorPhysics())
+        reference.set_time_step(24*60*60)
+        vectorised.set_time_step(24*60*60)
+        for i in range(20):
+            reference.next_time_step()
+            vectorised.next_time_step()
+        self.assert_same_state(reference.get_all_bodies(), vectorised.get_all_bodies(), TOLERANCE)
+
+    def test_test_particles(self):
+        reader = SolarSystemFile()
+        reference = reader.read_settings_file(StringIO(self.test_data))
+        vectorised = reader.read_settings_file(StringIO(self.test_data))
+        vectorised.set_physics(VectorPhysics())
+        for system in [reference, vectorised]:
+            system.set_time_step(24*60*60)
+            for i in range(3):
+                system.add_to_system(Satellite(1e30, [0, (i + 1)*40e9, 0], [-40e3, 0, 0], True))
+        for i in range(20):
+            reference.next_time_step()
+            vectorised.next_time_step()
+        self.assert_same_state(reference.get_all_bodies(), vectorised.get_all_bodies(), TOLERANCE)
+
+        # The heavy satellites must not affect the planets.
+        planets_only = reader.read_settings_file(StringIO(self.test_data))
+        planets_only.set_physics(VectorPhysics())
+        planets_only.set_time_step(24*60*60)
+        for i in range(20):
+            planets_only.next_time_step()
+        self.assert_same_state(planets_only.get_all_bodies(), vectorised.get_all_bodies()[:3], 0)
+
+@unittest.skipUnless(numba_physics.AVAILABLE, "Numba is not installed")
+class TestNumbaPhysics(unittest.TestCase):
+
+    def test_same_as_vector_physics(self):
+        rng = np.random.default_rng(0)
+        positions, velocities = rng.normal(size=(300, 3))*1e11, rng.normal(size=(300, 3))*1e4
+        masses = rng.random(300)*1e24
+        self_index = np.where(np.arange(300) < 200, np.arange(300), -1)
+        compiled, vector = numba_physics.NumbaPhysics(), VectorPhysics()
+        self.assertTrue(np.allclose(compiled.accelerations(positions, positions[:200], masses[:200], False),
+                                    vector.accelerations(positions, positions[:200], masses[:200], False), rtol=TOLERANCE, atol=0))
+        for expected, result in zip(vector.accelerations_and_jerks(positions, velocities, positions[:200], velocities[:200], masses[:200], self_index),
+                                    compiled.accelerations_and_jerks(positions, velocities, positions[:200], velocities[:200], masses[:200], self_index)):
+            self.assertTrue(np.allclose(result, expected, rtol=TOLERANCE, atol=0))
+
+    def test_same_steps_as_physics(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.set_physics(numba_physics.NumbaPhysics())
+        system.set_time_step(24*60*60)
+        reference = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        reference.set_physics(Physics())
+        reference.set_time_step(24*60*60)
+        for i in range(10):
+            system.next_time_step()
+            reference.next_time_step()
+        for body, expected in zip(system.get_all_bodies(), reference.get_all_bodies()):
+            self.assertTrue(np.allclose(body.get_position(), expected.get_position(), rtol=TOLERANCE, atol=0))
+
+class TestIntegrators(unittest.TestCase):
+
+    def run_year(self, name):
+        with open('settings.csv', 'r') as file:
+            system = SolarSystemFile().read_settings_file(file)
+        system.set_integrator(name)
+        system.set_time_step(24*60*60)
+        physics = system.get_physics()
+        energy = physics.energy(system.get_all_bodies())
+        for i in range(365):
+            system.next_time_step()
+        return abs(physics.energy(system.get_all_bodies())/energy - 1)
+
+    def test_energy_error(self):
+        self.assertLess(self.run_year('leapfrog'), 1e-6)
+        self.assertLess(self.run_year('yoshida4'), 1e-8)
+        self.assertLess(self.run_year('rk45'), 1e-8)
+
+    def test_block_time_steps(self):
+        systems = []
+        for name, options in [('rk45', {'rtol': 1e-12}), ('block', {'eta': 0.005})]:
+            system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+            system.add_to_system(Satellite(1000, [150E9 + 7E6, 0, 1E9], [0, 29.73E3 + 7.5E3, 0], True))
+            system.set_integrator(name, **options)
+            system.set_time_step(24*60*60)
+            for i in range(2):
+                system.next_time_step()
+            systems.append(system)
+
+        # Only the satellite in a close orbit needs short steps.
+        levels = systems[1].get_integrator().levels
+        self.assertEqual(list(levels[:3]), [0, 0, 0])
+        self.assertGreater(levels[3], 5)
+
+        satellites = [system.get_all_bodies()[3].get_position() for system in systems]
+        self.assertLess(sqrt(sum((satellites[0][i] - satellites[1][i])**2 for i in range(3))), 1E4)
+
+    def test_unknown_integrator(self):
+        system = SolarSystem()
+        with self.assertRaises(SolarSystemError):
+            system.set_integrator('euler')
+
+class TestBarnesHut(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.positions = rng.normal(size=(500, 3))*1e11
+        self.masses = rng.random(500)*1e24
+        self.exact = VectorPhysics().accelerations(self.positions, self.positions, self.masses, True)
+
+    def test_zero_theta_is_exact(self):
+        approximate = BarnesHutPhysics(0).accelerations(self.positions, self.positions, self.masses, True)
+        self.assertTrue(np.allclose(approximate, self.exact, rtol=1e-9, atol=0))
+
+    def test_opening_angle_error(self):
+        approximate = BarnesHutPhysics(0.5).accelerations(self.positions, self.positions, self.masses, True)
+        error = np.linalg.norm(approximate - self.exact, axis=1)/np.linalg.norm(self.exact, axis=1)
+        self.assertLess(np.median(error), 0.01)
+
+class TestSimulate(unittest.TestCase):
+
+    def test_no_qt_and_startup_budget(self):
+        code = "import sys, simulate; print('PyQt5' in sys.modules, simulate.IMPORT_TIME < simulate.STARTUP_BUDGET)"
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        self.assertEqual(result.stdout.split(), ['False', 'True'])
+
+    def test_output_can_be_read_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'state.csv')
+            self.assertEqual(simulate.main(['settings.csv', '--years', '0.1', '--integrator', 'leapfrog', '--output', output]), 0)
+            with open(output, 'r') as file:
+                system = SolarSystemFile().read_settings_file(file)
+        self.assertEqual(len(system.get_all_bodies()), 9)
+        self.assertNotEqual(system.get_body('Earth').get_position(), [150e9, 0, 0])
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_generated_system(self):
+        self.assertEqual(benchmark.generate(50, 1), benchmark.generate(50, 1))
+        system = SolarSystemFile().read_settings_file(StringIO(benchmark.generate(50, 1)))
+        self.assertEqual(len(system.get_all_bodies()), 50)
+
+    def test_results_and_comparison(self):
+        results = benchmark.run([10], ['physics', 'vector'], 'leapfrog', duration=0, render=False)
+        self.assertEqual([(result['engine'], result['integrator']) for result in results['results']], [('physics', 'RungeKutta4'), ('vector', 'Leapfrog')])
+        self.assertGreater(results['results'][1]['evaluations_per_second'], 0)
+        self.assertEqual(benchmark.compare(results, results), [])
+
+        # A run that is twice as slow is reported
+        slower = {'results': [dict(result, steps_per_second=result['steps_per_second']/2) for result in results['results']]}
+        self.assertEqual(len(benchmark.compare(slower, results)), 2)
+
+class TestStats(unittest.TestCase):
+
+    def test_phases_and_counters(self):
+        with open('settings.csv', 'r') as file:
+            system = SolarSystemFile().read_settings_file(file)
+        system.set_time_step(24*60*60)
+        log = StringIO()
+        stats = system.enable_stats(log_every=0, stream=log)
+        for i in range(10):
+            system.next_time_step()
+            system.check_impact()
+            system.check_satellites()
+
+        # VectorPhysics.rk4 evaluates the accelerations of the 9 bodies three times per step.
+        report = stats.report()
+        self.assertEqual(report['steps'], 10)
+        self.assertEqual(report['evaluations'], 10*3*9)
+        self.assertEqual(report['interactions'], 10*3*9*8)
+        for phase in ('integration', 'check_impact', 'check_satellites'):
+            self.assertEqual(report['phases'][phase]['calls'], 10)
+        self.assertLessEqual(report['phases']['forces']['time'], report['phases']['integration']['time'])
+        self.assertEqual(len(log.getvalue().splitlines()), 10)
+
+        # Switching the engine keeps measuring, disabling removes the timers.
+        system.set_physics(Physics())
+        system.next_time_step()
+        self.assertEqual(stats.evaluations, 10*3*9 + 4*9)
+        system.disable_stats()
+        self.assertNotIn('net_force', system.get_physics().__dict__)
+
+class TestTrajectory(unittest.TestCase):
+
+    def test_record_and_read(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.set_time_step(24*60*60)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run')
+            system.record_trajectory(path, 3, block_size=4)
+            for i in range(30):
+                system.next_time_step()
+            system.stop_recording()
+
+            trajectory = Trajectory(path)
+            self.assertEqual(len(trajectory), 11)
+            self.assertEqual(list(trajectory.times[:3]), [0, 3*24*60*60, 6*24*60*60])
+            self.assertEqual(list(trajectory.positions('Earth')[-1]), system.get_body('Earth').get_position())
+            self.assertEqual(list(trajectory.velocities(1)[-1]), system.get_body('Mercury').get_velocity())
+            self.assertEqual(trajectory.window(3*24*60*60, 9*24*60*60), slice(1, 4))
+            self.assertEqual(np.load(path + '.npy').shape, (11, 19))
+            del trajectory
+
+class TestSweep(unittest.TestCase):
+
+    def test_sweep(self):
+        satellites = [(1000, [150E9 + 1E7, 0, 0], [-1E4, 29.73E3, 0]), (1000, [7.8E12, 0, 0], [1E8, 0, 0]), (1000, [1E13, 0, 0], [0, 0, 0])]
+        results = sweep.sweep('settings.csv', satellites, years=0.001, dt=0.01, test_particles=True, workers=2)
+        self.assertEqual([result['status'] for result in results], ['impact', 'escape', 'Satellite is too far away.'])
+        self.assertEqual(results[0]['closest_body'], 'Earth')
+        self.assertLess(results[0]['closest_distance'], 637E4)
+
+        table = StringIO()
+        sweep.write_table(results, table)
+        self.assertEqual(len(table.getvalue().splitlines()), 4)
+
+class TestSimulationWorker(unittest.TestCase):
+
+    def test_worker(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.set_time_step(24*60*60)
+        system.set_lifespan(100*24*60*60)
+        worker = SimulationWorker(system)
+        worker.start()
+        snapshot = None
+        while snapshot is None and not worker.finished:
+            snapshot = worker.take()
+        worker.join()
+        self.assertEqual(worker.steps, 100)
+        self.assertEqual(system.get_time(), 100*24*60*60)
+        if snapshot is not None:
+            self.assertEqual(len(snapshot.get_state(system.get_body('Earth'))), 3)
+
+    def test_stop(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.set_time_step(24*60*60)
+        system.set_lifespan(1E12)
+        worker = SimulationWorker(system)
+        worker.start()
+        worker.stop()
+        worker.join(10)
+        self.assertTrue(worker.finished)
+        self.assertLess(system.get_time(), 1E12)
+
+class TestCollision(unittest.TestCase):
+
+    def test_sweep_and_prune(self):
+        rng = np.random.default_rng(1)
+        for n in [2, 10, 300]:
+            positions = rng.random((n, 3))*100
+            radii = rng.random(n)*3
+            expected = set()
+            for i in range(n):
+                for j in range(i + 1, n):
+                    if np.sum((positions[i] - positions[j])**2) <= (radii[i] + radii[j])**2:
+                        expected.add((i, j))
+            pair = sweep_and_prune(positions, radii)
+            if expected:
+                self.assertIn(pair, expected)
+            else:
+                self.assertIsNone(pair)
+
+    def test_impact_is_reported(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.set_time(100)
+        system.add_to_system(Satellite(1000, [57.9E9, 1E6, 0], [0, 0, 0]))
+        system.check_impact()
+        self.assertTrue(system.impact_status())
+        self.assertEqual(system.get_impact(), (system.get_body('Mercury'), system.get_all_bodies()[3], 100))
+
+class TestContinuousCollision(unittest.TestCase):
+
+    def run_through_earth(self, continuous):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.add_to_system(Satellite(1000, [145E9, 0, 1E9], [5E4, 29.73E3, 0], True))
+        system.set_continuous_collisions(continuous)
+        system.set_integrator('leapfrog')
+        system.set_time_step(7*24*60*60)
+        system.next_time_step()
+        system.check_impact()
+        return system
+
+    def test_fast_satellite_is_caught(self):
+        self.assertFalse(self.run_through_earth(False).impact_status())
+        system = self.run_through_earth(True)
+        self.assertTrue(system.impact_status())
+        body1, body2, time = system.get_impact()
+        self.assertEqual(body1.get_name(), 'Earth')
+        # The satellite reaches the Earth after about 5E9/5E4 seconds.
+        self.assertAlmostEqual(time/(24*60*60), 1.156, 1)
+
+    def test_hermite_end_points(self):
+        pos_0, vel_0 = np.array([[0.0, 0, 0]]), np.array([[1.0, 0, 0]])
+        pos_1, vel_1 = np.array([[3.0, 1, 0]]), np.array([[2.0, 0, 0]])
+        self.assertTrue(np.allclose(hermite(pos_0, vel_0, pos_1, vel_1, 2, 0), pos_0))
+        self.assertTrue(np.allclose(hermite(pos_0, vel_0, pos_1, vel_1, 2, 1), pos_1))
+
+class TestCheckpoint(unittest.TestCase):
+
+    def test_restore(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        system.add_to_system(Satellite(1000, [0, 80E9, 0], [40E3, 0, 0], True))
+        system.set_integrator('leapfrog')
+        system.set_time_step(24*60*60)
+        system.set_lifespan(1E9)
+        for i in range(10):
+            system.next_time_step()
+        data = system.checkpoint()
+        for i in range(10):
+            system.next_time_step()
+        expected = [list(body.get_position()) for body in system.get_all_bodies()]
+
+        # Restoring into the same system keeps the bodies
+        bodies = list(system.get_all_bodies())
+        system.restore(data)
+        self.assertEqual(system.get_all_bodies(), bodies)
+        self.assertEqual(system.get_time(), 10*24*60*60)
+
+        # Restoring into a new system recreates them
+        copy = SolarSystem()
+        copy.restore(data)
+        self.assertTrue(copy.get_all_bodies()[3].is_test_particle())
+        self.assertEqual(copy.get_lifespan(), 1E9)
+        for i in range(10):
+            copy.next_time_step()
+        self.assertEqual([body.get_position() for body in copy.get_all_bodies()], expected)
+
+    def test_saved_state_does_not_grow(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        for i in range(3):
+            system.save_state()
+        self.assertEqual([state.shape for state in system.saved_state], [(3, 3)]*3)
+
+class TestBodyStore(unittest.TestCase):
+
+    def test_bodies_are_views(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        earth = system.get_all_bodies()[1]
+        earth.update_position([1.0, 2.0, 3.0])
+        self.assertEqual(system.store.pos[1].tolist(), [1.0, 2.0, 3.0])
+        system.store.vel[1] = [4.0, 5.0, 6.0]
+        self.assertEqual(earth.get_velocity(), [4.0, 5.0, 6.0])
+
+    def test_add_and_remove(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        bodies = list(system.get_all_bodies())
+        satellite = Satellite(1000, [1e11, 0, 0], [0, 3e4, 0])
+        system.add_to_system(satellite)
+        self.assertTrue(system.store.satellite[len(bodies)])
+
+        # Removing a body moves the rows after it up, and the removed body keeps its state
+        position = bodies[1].get_position()
+        system.remove_from_system(bodies[1])
+        self.assertEqual(bodies[1].get_position(), position)
+        self.assertEqual(system.get_all_bodies(), [bodies[0], bodies[2], satellite])
+        self.assertEqual(satellite.get_position(), [1e11, 0, 0])
+        self.assertEqual(system.store.pos[2].tolist(), [1e11, 0, 0])
+
+    def test_return_to_saved_state(self):
+        system = SolarSystemFile().read_settings_file(StringIO(TestVectorPhysics.test_data))
+        bodies = list(system.get_all_bodies())
+        expected = [body.get_position() for body in bodies]
+        system.add_to_system(Satellite(1000, [1e11, 0, 0], [0, 3e4, 0]))
+        system.set_time_step(24*60*60)
+        for i in range(5):
+            system.next_time_step()
+        system.return_to_saved_state()
+        self.assertEqual(system.get_all_bodies(), bodies)
+        self.assertEqual([body.get_position() for body in bodies], expected)
+
 class TestFileReader(unittest.TestCase):
 
     def test_read_settings_file(self):
@@ -50,6 +449,15 @@ class TestFileReader(unittest.TestCase):
         self.assertEqual(system.get_body('Mercury').get_position(), [57.9e9,0,0], "Wrong position")
         self.assertEqual(system.get_body('Mercury').get_velocity(), [0,47.39e3,0], "Wrong velocity")
 
+    def test_initial_accelerations(self):
+        with open('settings.csv', 'r') as file:
+            system = SolarSystemFile().read_settings_file(file)
+        physics = Physics()
+        for body in system.get_all_bodies():
+            expected = physics.acceleration(physics.net_force(body, system.get_all_bodies()), body.get_mass())
+            for i in range(3):
+                self.assertAlmostEqual(body.get_acceleration()[i], expected[i], delta=1e-12*max(abs(c) for c in expected))
+
     def test_same_position_file(self):
         test_data = "Sun,1.989E30,696E6,0:0:0,0:0:0,255:255:0\n" + "Mercury,3.3E23,2439E3,0:0:0,0:47.39E3:0,186:169:145\n"
         self.test_file = StringIO(test_data)
@@ -0,0 +1,146 @@
+import json
+import numpy as np
+from physics import DIMENSION
+from solar_system_error import SolarSystemError
+
+# Size of the .npy header in bytes. The header is rewritten with the final number of frames when the file is closed,
+# so it always takes the same space.
+HEADER_SIZE = 128
+
+class TrajectoryWriter:
+    """
+    Streams the states of all bodies of a SolarSystem to a trajectory file.
+
+    A trajectory with the base path 'run' consists of two files:
+    run.npy: a flat .npy array of shape (frames, 1 + 2*DIMENSION*N). Each row is one frame: the time followed by the
+             position and velocity of each body.
+    run.json: the index, which holds the names, masses, radii and colours of the bodies and the output cadence.
+
+    Frames are collected into a buffer of block_size frames and written a whole block at a time.
+    """
+
+    def __init__(self, path, celestial_bodies, cadence=1, block_size=256, dtype='float64'):
+        """
+        path: base path of the trajectory files, without extension
+        celestial_bodies: bodies whose states are recorded. The set of bodies must not change during the recording.
+        cadence: a frame is recorded every cadence steps
+        block_size: number of frames that are buffered before writing
+        dtype: 'float64', or 'float32' for files half the size
+        """
+        self.path = path
+        self.bodies = list(celestial_bodies)
+        self.cadence = cadence
+        self.columns = 1 + 2*DIMENSION*len(self.bodies)
+        self.dtype = np.dtype(dtype)
+
+        self.buffer = np.empty((block_size, self.columns), dtype=self.dtype)
+        self.buffered = 0
+        self.frames = 0
+        self.steps = 0
+
+        index = {
+            'names': [body.get_name() for body in self.bodies],
+            'masses': [body.get_mass() for body in self.bodies],
+            'radii': [body.get_radius() for body in self.bodies],
+            'colours': [list(body.get_colour()) for body in self.bodies],
+            'satellites': [body.get_name() is None for body in self.bodies],
+            'cadence': cadence,
+            'dtype': self.dtype.str,
+        }
+        with open(path + '.json', 'w') as file:
+            json.dump(index, file)
+
+        self.file = open(path + '.npy', 'wb')
+        self.write_header()
+
+    def write_header(self):
+        """Writes the .npy header for the frames written so far to the beginning of the file."""
+        header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({}, {}), }}".format(self.dtype.str, self.frames, self.columns)
+        header = header.ljust(HEADER_SIZE - 10 - 1) + '\n'
+        self.file.seek(0)
+        self.file.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+        self.file.seek(0, 2)
+
+    def record(self, system):
+        """
+        Called after every time step. Adds the current state of the system to the buffer if the step is on the output cadence.
+        """
+        self.steps += 1
+        if self.steps % self.cadence == 0:
+            self.add_frame(system)
+
+    def add_frame(self, system):
+        """Adds the current state of the system to the buffer and writes the buffer when it is full."""
+        if len(system.get_all_bodies()) != len(self.bodies):
+            raise SolarSystemError("Bodies cannot be added or removed while a trajectory is recorded.")
+        frame = self.buffer[self.buffered]
+        frame[0] = system.get_time()
+        states = frame[1:].reshape(len(self.bodies), 2, DIMENSION)
+        pos, vel, acc, masses = system.store.get_arrays()
+        states[:, 0], states[:, 1] = pos, vel
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered frames to the file."""
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.frames += self.buffered
+        self.buffered = 0
+
+    def close(self):
+        """Writes the remaining frames and the final header and closes the file."""
+        self.flush()
+        self.write_header()
+        self.file.close()
+
+class Trajectory:
+    """
+    Read access to a trajectory written by TrajectoryWriter. The frames are memory-mapped, so slicing one body or
+    one time window only reads that part of the file. A file whose recording was interrupted can still be read:
+    the number of frames is determined from the file size.
+    """
+
+    def __init__(self, path):
+        with open(path + '.json', 'r') as file:
+            index = json.load(file)
+        self.names = index['names']
+        self.masses = index['masses']
+        self.radii = index['radii']
+        self.colours = index['colours']
+        self.satellites = index['satellites']
+        self.cadence = index['cadence']
+
+        dtype = np.dtype(index['dtype'])
+        columns = 1 + 2*DIMENSION*len(self.names)
+        with open(path + '.npy', 'rb') as file:
+            size = file.seek(0, 2)
+        frames = (size - HEADER_SIZE)//(columns*dtype.itemsize)
+        if frames > 0:
+            self.data = np.memmap(path + '.npy', dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(frames, columns))
+        else:
+            self.data = np.empty((0, columns), dtype=dtype)
+
+        self.times = self.data[:, 0]
+        self.states = self.data[:, 1:].reshape(frames, len(self.names), 2, DIMENSION)
+
+    def __len__(self):
+        return len(self.times)
+
+    def body_index(self, body):
+        """Returns the index of the body given by its name or index."""
+        if isinstance(body, str):
+            return self.names.index(body)
+        return body
+
+    def positions(self, body):
+        """Returns the positions of one body, given by its name or index, as a (frames, 3) array."""
+        return self.states[:, self.body_index(body), 0]
+
+    def velocities(self, body):
+        """Returns the velocities of one body, given by its name or index, as a (frames, 3) array."""
+        return self.states[:, self.body_index(body), 1]
+
+    def window(self, start, end):
+        """Returns the frame slice that covers times start <= t <= end (seconds)."""
+        return slice(np.searchsorted(self.times, start, 'left'), np.searchsorted(self.times, end, 'right'))
@@ -0,0 +1,191 @@
+import numpy as np
+from physics import Physics, DIMENSION, GRAV_CONSTANT
+from body_store import BodyStore
+
+# Relative tolerance within which VectorPhysics agrees with Physics. The only differences come from the
+# order of floating point operations, so in practice the results match to about 1e-13.
+TOLERANCE = 1e-9
+
+# Upper limit for the number of pairwise displacements held in memory at once.
+BLOCK_SIZE = 2**21
+
+class VectorPhysics(Physics):
+    """
+    Physics engine that keeps the positions, velocities and masses of all bodies in contiguous (N, 3) float64 arrays
+    and computes every pairwise acceleration in one batched NumPy operation.
+    Gives the same results as Physics within the relative tolerance TOLERANCE.
+    """
+
+    def __init__(self):
+        self.evaluations = 0        # Number of bodies whose acceleration has been evaluated
+        self.interactions = 0       # Number of pairwise interactions evaluated
+
+    def rk4(self, celestial_bodies, h):
+        """
+        Calculates and updates the acceleration, velocity and position of all objects in celestial_bodies.
+        Uses the same scheme as Physics.rk4: every stage moves only the body in question, while the others stay at their initial positions.
+        Returns the updated list.
+
+        celestial_bodies: list of all objects
+        h: time step
+        """
+        pos_0, v_0, a_1, masses, n_massive, order = self.get_state(celestial_bodies)
+
+        v_1 = v_0 + a_1*(h/2)
+        pos_1 = pos_0 + v_0*(h/2)
+        a_2 = self.gravity(pos_1, pos_0, masses, n_massive)
+
+        v_2 = v_0 + a_2*(h/2)
+        pos_2 = pos_0 + v_1*(h/2)
+        a_3 = self.gravity(pos_2, pos_0, masses, n_massive)
+
+        pos_3 = pos_0 + v_2*h
+        a_4 = self.gravity(pos_3, pos_0, masses, n_massive)
+
+        final_v = v_0 + (h/6)*(a_1 + 2*(a_2 + a_3) + a_4)
+        final_pos = pos_0 + h*v_0
+
+        # Physics.rk4 evaluates the final acceleration before moving the body back, so it equals a_4.
+        self.set_state(celestial_bodies, order, final_pos, final_v, a_4)
+        return celestial_bodies
+
+    def gravity(self, targets, sources, masses, n_massive):
+        """
+        Calculates the accelerations of all bodies in a state ordered by get_state().
+        The first n_massive rows are massive bodies that attract each other, the rest are test particles that are only attracted by them.
+        Takes O(n_massive*N) time.
+
+        targets: (N, 3) array of positions where the acceleration is evaluated
+        sources: (N, 3) array of the positions of the bodies causing gravity
+        masses: (N,) array of masses
+        n_massive: number of massive bodies
+        """
+        acc = np.empty((len(targets), DIMENSION))
+        acc[:n_massive] = self.accelerations(targets[:n_massive], sources[:n_massive], masses[:n_massive], True)
+        acc[n_massive:] = self.accelerations(targets[n_massive:], sources[:n_massive], masses[:n_massive], False)
+        return acc
+
+    def accelerations(self, targets, sources, masses, exclude_self=False):
+        """
+        Calculates the gravitational acceleration at each of the target positions caused by all source bodies.
+        Returns an (N, 3) array.
+
+        targets: (N, 3) array of positions where the acceleration is evaluated
+        sources: (M, 3) array of the positions of the attracting bodies
+        masses: (M,) array of the masses of the attracting bodies
+        exclude_self: if True, targets and sources are the same bodies and target i is not attracted by source i
+        """
+        self.evaluations += len(targets)
+        self.interactions += len(targets)*(len(sources) - 1 if exclude_self else len(sources))
+        acc = np.zeros((len(targets), DIMENSION))
+        if len(targets) == 0 or len(sources) == 0:
+            return acc
+
+        # Process the targets in blocks so that the pairwise arrays stay at a bounded size.
+        step = max(1, BLOCK_SIZE//len(sources))
+        for start in range(0, len(targets), step):
+            end = min(start + step, len(targets))
+            r = sources[np.newaxis, :, :] - targets[start:end, np.newaxis, :]
+            r_squared = np.einsum('ijk,ijk->ij', r, r)
+            if exclude_self:
+                rows = np.arange(end - start)
+                r_squared[rows, rows + start] = np.inf
+            factor = GRAV_CONSTANT*masses/(r_squared*np.sqrt(r_squared))
+            acc[start:end] = np.einsum('ij,ijk->ik', factor, r)
+        return acc
+
+    def accelerations_and_jerks(self, targets, target_vel, sources, source_vel, masses, self_index=None):
+        """
+        Calculates the gravitational acceleration and its time derivative (jerk) for each target caused by all source bodies.
+        Returns two (N, 3) arrays.
+
+        targets, target_vel: (N, 3) arrays of the positions and velocities of the targets
+        sources, source_vel: (M, 3) arrays of the positions and velocities of the attracting bodies
+        masses: (M,) array of the masses of the attracting bodies
+        self_index: (N,) array giving for each target the index of the source it is not attracted by, or -1 if none
+        """
+        self.evaluations += len(targets)
+        self.interactions += len(targets)*len(sources) - (int(np.count_nonzero(self_index >= 0)) if self_index is not None else 0)
+        acc = np.zeros((len(targets), DIMENSION))
+        jerk = np.zeros((len(targets), DIMENSION))
+        if len(targets) == 0 or len(sources) == 0:
+            return acc, jerk
+
+        step = max(1, BLOCK_SIZE//len(sources))
+        for start in range(0, len(targets), step):
+            end = min(start + step, len(targets))
+            r = sources[np.newaxis, :, :] - targets[start:end, np.newaxis, :]
+            v = source_vel[np.newaxis, :, :] - target_vel[start:end, np.newaxis, :]
+            r_squared = np.einsum('ijk,ijk->ij', r, r)
+            if self_index is not None:
+                rows = np.nonzero(self_index[start:end] >= 0)[0]
+                r_squared[rows, self_index[start:end][rows]] = np.inf
+            factor = GRAV_CONSTANT*masses/(r_squared*np.sqrt(r_squared))
+            r_dot_v = np.einsum('ijk,ijk->ij', r, v)/r_squared
+            acc[start:end] = np.einsum('ij,ijk->ik', factor, r)
+            jerk[start:end] = np.einsum('ij,ijk->ik', factor, v) - 3*np.einsum('ij,ijk->ik', factor*r_dot_v, r)
+        return acc, jerk
+
+    def energy(self, celestial_bodies):
+        """
+        Calculates the total (kinetic + potential) energy of the massive bodies in joules.
+        Test particles are left out, since they do not take part in the conservation of energy.
+        """
+        pos, vel, acc, masses, n_massive, order = self.get_state(celestial_bodies)
+        pos, vel, masses = pos[:n_massive], vel[:n_massive], masses[:n_massive]
+        kinetic = 0.5*np.sum(masses*np.einsum('ij,ij->i', vel, vel))
+        potential = 0
+        for i in range(n_massive - 1):
+            r = np.sqrt(np.einsum('ij,ij->i', pos[i + 1:] - pos[i], pos[i + 1:] - pos[i]))
+            potential -= GRAV_CONSTANT*masses[i]*np.sum(masses[i + 1:]/r)
+        return kinetic + potential
+
+    def get_state(self, celestial_bodies):
+        """
+        Returns the state of the bodies as arrays ordered so that the massive bodies come first and the test particles
+        after them: positions, velocities and accelerations as (N, 3) arrays, masses as an (N,) array, the number of
+        massive bodies and the order, an (N,) array of indices into celestial_bodies. The rows of the two groups are then
+        contiguous blocks, and slicing them apart does not copy anything.
+        If celestial_bodies is the list of a SolarSystem, the arrays are taken from its BodyStore without visiting the bodies.
+        They may then be views into the store, so they must not be modified in place.
+        """
+        store = BodyStore.of(celestial_bodies)
+        if store is not None:
+            pos, vel, acc, masses = store.get_arrays()
+            test_particles = store.test_particle[:store.n]
+        else:
+            pos, vel, acc, masses = self.get_arrays(celestial_bodies)
+            test_particles = np.array([body.is_test_particle() for body in celestial_bodies], dtype=bool)
+        n_massive = len(test_particles) - int(test_particles.sum())
+        if n_massive == len(test_particles):
+            order = np.arange(len(test_particles))
+            return pos, vel, acc, masses, n_massive, order
+        order = np.argsort(test_particles, kind='stable')
+        return pos[order], vel[order], acc[order], masses[order], n_massive, order
+
+    def set_state(self, celestial_bodies, order, pos, vel, acc):
+        """Writes state arrays ordered by get_state() back to the bodies."""
+        store = BodyStore.of(celestial_bodies)
+        if store is not None:
+            store.pos[order], store.vel[order], store.acc[order] = pos, vel, acc
+        else:
+            self.set_arrays([celestial_bodies[i] for i in order], pos, vel, acc)
+
+    def get_arrays(self, celestial_bodies):
+        """
+        Copies the state of the bodies into arrays.
+        Returns positions, velocities and accelerations as (N, 3) arrays and masses as an (N,) array.
+        """
+        pos = np.array([body.get_position() for body in celestial_bodies], dtype=float).reshape(-1, DIMENSION)
+        vel = np.array([body.get_velocity() for body in celestial_bodies], dtype=float).reshape(-1, DIMENSION)
+        acc = np.array([body.get_acceleration() for body in celestial_bodies], dtype=float).reshape(-1, DIMENSION)
+        masses = np.array([body.get_mass() for body in celestial_bodies], dtype=float)
+        return pos, vel, acc, masses
+
+    def set_arrays(self, celestial_bodies, pos, vel, acc):
+        """Writes the arrays back to the bodies as lists."""
+        pos, vel, acc = pos.tolist(), vel.tolist(), acc.tolist()
+        for i in range(len(celestial_bodies)):
+            celestial_bodies[i].update_position(pos[i])
+            celestial_bodies[i].update_velocity(vel[i])
+            celestial_bodies[i].update_acceleration(acc[i])